@@ -0,0 +1,312 @@
+# Deterministic benchmark for the games, the clock and the transitions.
+#
+# Every scenario runs on the headless backend with a seeded random and a
+# scripted input sequence. Time is virtual: sleeps return at once and only
+# advance the virtual clock, so the loops run at full speed while the game
+# logic sees exactly the same timeline on every run. Each scenario runs
+# twice, once for timings and once under tracemalloc for allocations.
+#
+#   python benchmark.py [--seed N] [--duration SECONDS] [--indexed]
+#                       [scenario ...]
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+os.environ['LEDMATRIX_BACKEND'] = 'headless'
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
+import pygame  # noqa: E402
+
+from src import RES_DIR  # noqa: E402
+from src import main, tetris, snake, clock  # noqa: E402
+from src import backends, display, inputs, scheduler  # noqa: E402
+
+REAL_CLOCK = time.perf_counter
+# virtual wall clock start, 2021-01-01 12:34:56 UTC
+EPOCH = 1609504496.0
+
+
+class Finished(Exception):
+    pass
+
+
+class VirtualTime:
+    # Replaces the time functions the loops use. Scripted actions are
+    # posted to the input queue when the virtual clock passes them.
+
+    def __init__(self, script, duration):
+        self.now = 0.0
+        self.script = sorted(script)
+        self.duration = duration
+
+    def advance(self, seconds):
+        target = self.now + max(seconds, 0)
+        while self.script and self.script[0][0] <= target:
+            self.now, action = self.script.pop(0)
+            inputs.post(action)
+        self.now = target
+        if self.now > self.duration:
+            raise Finished()
+
+    def next_action(self):
+        return self.script[0][0] if self.script else None
+
+    def time(self):
+        return EPOCH + self.now
+
+    def perf_counter(self):
+        return self.now
+
+    def localtime(self, seconds=None):
+        return time.gmtime(self.time() if seconds is None else seconds)
+
+
+class VirtualEvent:
+    # stands in for inputs.ARRIVED so idle loops wait in virtual time
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.flag = False
+
+    def set(self):
+        self.flag = True
+
+    def clear(self):
+        self.flag = False
+
+    def is_set(self):
+        return self.flag
+
+    def wait(self, timeout=None):
+        if not self.flag:
+            due = self.clock.next_action()
+            if due is not None and due <= self.clock.now + timeout:
+                self.clock.advance(due - self.clock.now)
+            else:
+                self.clock.advance(timeout)
+        return self.flag
+
+
+class Recorder:
+    # Splits the real time of every frame into render, push and logic.
+    # A frame ends whenever a loop calls Scheduler.wait().
+
+    RENDER = [(display.Display, 'clearScreen'),
+              (display.Display, 'drawImage'),
+              (display.Display, 'drawnumber'),
+              (display.Display, 'scoreText'),
+              (display.Display, 'drawChanges'),
+              (tetris, 'drawBoard'), (snake, 'drawWorm'),
+              (snake, 'drawApple'),
+              (clock, 'binary_clock_overlay')]
+    PUSH = [(display.Display, 'updateScreen')]
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.frames = []
+        self.current = {'render': 0.0, 'push': 0.0}
+        self.start = REAL_CLOCK()
+        self.patched = []
+
+    def wrap(self, module, name, key):
+        original = getattr(module, name)
+
+        def timed(*args, **kwargs):
+            start = REAL_CLOCK()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.current[key] += REAL_CLOCK() - start
+        setattr(module, name, timed)
+        self.patched.append((module, name, original))
+
+    def frame(self):
+        end = REAL_CLOCK()
+        frame = dict(self.current, total=end - self.start)
+        frame['logic'] = max(
+            frame['total'] - frame['render'] - frame['push'], 0)
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            frame['alloc'] = peak - self.memory_start
+            tracemalloc.reset_peak()
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+        self.frames.append(frame)
+        self.current = {'render': 0.0, 'push': 0.0}
+        self.start = REAL_CLOCK()
+
+    def __enter__(self):
+        for module, name in self.RENDER:
+            self.wrap(module, name, 'render')
+        for module, name in self.PUSH:
+            self.wrap(module, name, 'push')
+        original_wait = scheduler.Scheduler.wait
+        recorder = self
+
+        def wait(sched):
+            recorder.frame()
+            return original_wait(sched)
+        scheduler.Scheduler.wait = wait
+        self.patched.append((scheduler.Scheduler, 'wait', original_wait))
+        if self.trace_memory:
+            tracemalloc.start()
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+        self.start = REAL_CLOCK()
+        return self
+
+    def __exit__(self, *exc):
+        if self.trace_memory:
+            tracemalloc.stop()
+        for module, name, original in reversed(self.patched):
+            setattr(module, name, original)
+
+
+def random_script(rng, duration, actions, interval=(0.05, 0.3)):
+    script = []
+    t = 0.5
+    while t < duration:
+        script.append((t, rng.choice(actions)))
+        t += rng.uniform(*interval)
+    return script
+
+
+def tetris_scenario(rng, duration):
+    script = random_script(
+        rng, duration, ['LEFT', 'RIGHT', 'A', 'B', 'DOWN', 'UP', 'UP'])
+    def run(matrix):
+        # a new game after every game over, until the time is up
+        while True:
+            tetris.runTetrisGame(matrix)
+    return script, run
+
+
+def snake_scenario(rng, duration):
+    script = random_script(
+        rng, duration, ['LEFT', 'RIGHT', 'UP', 'DOWN'], (0.1, 0.6))
+    def run(matrix):
+        while True:
+            snake.runSnakeGame(matrix)
+    return script, run
+
+
+def clock_scenario(rng, duration):
+    script = [(t, 'A') for t in range(5, int(duration), 5)]
+    return script, lambda matrix: main.drawClock(matrix, 0)
+
+
+def transition_scenario(rng, duration):
+    def run(matrix):
+        while True:
+            main.transition(matrix, 'circle', 26, 0.6, True)
+            main.transition(matrix, 'menu', 5, 0.05)
+    return [], run
+
+
+SCENARIOS = {
+    'tetris': tetris_scenario,
+    'snake': snake_scenario,
+    'clock': clock_scenario,
+    'transition': transition_scenario,
+}
+# resources a scenario needs besides the ones in the repository
+REQUIRES = {
+    'transition': ['animations/circle', 'animations/menu'],
+}
+
+
+def run_scenario(matrix, name, seed, duration, trace_memory=False):
+    rng = random.Random(seed)
+    script, run = SCENARIOS[name](rng, duration)
+    random.seed(seed)
+    virtual = VirtualTime(script, duration)
+    output = backends.HeadlessBackend(keep=1)
+    matrix.setOutput(output)
+    matrix.clearScreen()
+    inputs.QUEUE.clear()
+    patches = [(time, 'time', virtual.time),
+               (time, 'perf_counter', virtual.perf_counter),
+               (time, 'sleep', virtual.advance),
+               (time, 'localtime', virtual.localtime),
+               (inputs, 'ARRIVED', VirtualEvent(virtual))]
+    originals = [(m, n, getattr(m, n)) for m, n, _ in patches]
+    for module, attr, value in patches:
+        setattr(module, attr, value)
+    try:
+        with Recorder(trace_memory) as recorder:
+            try:
+                run(matrix)
+            except Finished:
+                pass
+    finally:
+        for module, attr, value in originals:
+            setattr(module, attr, value)
+    return recorder.frames, output.stats
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def report(name, frames, stats, alloc_frames):
+    ms = 1000
+    total = [f['total'] for f in frames]
+    print(f"{name}: {len(frames)} frames, {stats['pushed']} pushed, "
+          f"{stats['skipped']} skipped, {stats['bytes']} bytes")
+    for key in ('logic', 'render', 'push'):
+        values = [f[key] for f in frames]
+        print(f"  {key:<7} p50 {percentile(values, 50) * ms:7.3f} ms"
+              f"  p99 {percentile(values, 99) * ms:7.3f} ms")
+    print(f"  frame   p50 {percentile(total, 50) * ms:7.3f} ms"
+          f"  p99 {percentile(total, 99) * ms:7.3f} ms")
+    alloc = [f['alloc'] for f in alloc_frames]
+    print(f"  alloc   p50 {percentile(alloc, 50) / 1024:7.1f} KiB"
+          f"  max {max(alloc, default=0) / 1024:7.1f} KiB")
+
+
+def setup(indexed=False):
+    # the display all scenarios draw on, its outputs are replaced per run
+    pygame.init()
+    surface = pygame.display.set_mode(
+        (main.PIXEL_X*main.SIZE, main.PIXEL_Y*main.SIZE))
+    main.BASICFONT = pygame.font.Font('freesansbold.ttf', 18)
+    main.BIGFONT = pygame.font.Font('freesansbold.ttf', 100)
+    return display.Display(main.PIXEL_X, main.PIXEL_Y, surface=surface,
+                           indexed=indexed)
+
+
+def run_benchmarks():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the games on the headless backend.')
+    parser.add_argument('scenarios', nargs='*', default=list(SCENARIOS),
+                        help=', '.join(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--duration', type=float, default=60,
+                        help='virtual seconds per scenario')
+    parser.add_argument('--indexed', action='store_true',
+                        help='draw into a palette indexed framebuffer')
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(sorted(unknown))}")
+
+    matrix = setup(args.indexed)
+    for name in args.scenarios:
+        missing = [r for r in REQUIRES.get(name, [])
+                   if not os.path.exists(os.path.join(RES_DIR, r))]
+        if missing:
+            print(f"{name}: skipped, missing {', '.join(missing)}")
+            continue
+        frames, stats = run_scenario(matrix, name, args.seed, args.duration)
+        alloc_frames, _ = run_scenario(
+            matrix, name, args.seed, args.duration, True)
+        report(name, frames, stats, alloc_frames)
+
+
+if __name__ == '__main__':
+    sys.exit(run_benchmarks())
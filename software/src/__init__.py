@@ -1,6 +1,18 @@
+import os
 from os import path
 
 INSTALL_DIR = '/home/ben/Documents'
 
 RES_DIR = path.join(path.dirname((path.dirname(__file__))), 'res')
 PI = True
+
+# Frames can be sent to the 'neopixel' strip, a 'pygame' window or kept in
+# memory by the 'headless' backend, which runs without any display and
+# therefore always in simulation mode.
+BACKENDS = ('neopixel', 'pygame', 'headless')
+BACKEND = os.environ.get('LEDMATRIX_BACKEND', 'neopixel' if PI else 'pygame')
+if BACKEND not in BACKENDS:
+    raise ValueError("LEDMATRIX_BACKEND must be one of {}, not {!r}".format(
+        ', '.join(BACKENDS), BACKEND))
+if BACKEND == 'headless':
+    PI = False
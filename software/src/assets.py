@@ -0,0 +1,80 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageFont
+
+from . import RES_DIR
+
+# decoded resources kept in memory, least recently used ones are dropped
+CACHE_SIZE = 64
+
+_cache = OrderedDict()
+# the game loop, the scoreboard worker and the loader share the cache
+_lock = threading.Lock()
+
+
+def _cached(key, decode):
+    with _lock:
+        value = _cache.get(key)
+        if value is not None:
+            _cache.move_to_end(key)
+            return value
+    value = decode(key[1])
+    with _lock:
+        _cache[key] = value
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return value
+
+
+def _decode_rgb(path):
+    with Image.open(path) as im:
+        # keep the alpha channel of images that have one
+        if 'A' in im.getbands() or 'transparency' in im.info:
+            image = np.array(im.convert('RGBA'))
+        else:
+            image = np.array(im.convert('RGB'))
+    image.flags.writeable = False
+    return image
+
+
+def _decode_bitmap(path):
+    with Image.open(path) as im:
+        return im.convert('1')
+
+
+def load(path):
+    # image as a read-only (height, width, 3 or 4) uint8 array
+    return _cached(('rgb', os.path.normpath(path)), _decode_rgb)
+
+
+def load_bitmap(path):
+    # 1 bit PIL image for the dot matrix display
+    return _cached(('bitmap', os.path.normpath(path)), _decode_bitmap)
+
+
+def _decode_font(font):
+    path, size = font
+    return ImageFont.truetype(path, size)
+
+
+def load_font(path, size):
+    # PIL truetype font for the dot matrix display
+    return _cached(('font', (os.path.normpath(path), size)), _decode_font)
+
+
+def warm(directory=RES_DIR):
+    # decode all colour images below directory ahead of time
+    for root, dirs, files in os.walk(directory):
+        if os.path.basename(root) == 'dotmatrix':
+            continue
+        for name in sorted(files):
+            if name.endswith('.bmp'):
+                load(os.path.join(root, name))
+
+
+def clear():
+    with _lock:
+        _cache.clear()
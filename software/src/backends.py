@@ -0,0 +1,192 @@
+from collections import deque
+
+import numpy as np
+import pygame
+
+from . import framebuffer
+from . import palette
+
+
+class Backend:
+    # Output for the composed frames. updateScreen calls push() with every
+    # frame that changed and skip() for every frame that did not.
+
+    def __init__(self):
+        self.stats = {'pushed': 0, 'skipped': 0, 'bytes': 0}
+
+    def push(self, frame):
+        self.stats['pushed'] += 1
+        self.stats['bytes'] += self.write(frame)
+
+    def skip(self):
+        self.stats['skipped'] += 1
+
+    def set_brightness(self, brightness):
+        # outputs without brightness control ignore it
+        pass
+
+    def set_overlays(self, overlays):
+        # (surface, rect) pairs to show over the next frame, outputs that
+        # cannot show text ignore them
+        pass
+
+    def write(self, frame):
+        # show the frame, return the number of bytes sent
+        raise NotImplementedError
+
+
+class NeoPixelBackend(Backend):
+    # WS2812 strip driven through neopixel_write on the given board pin.
+    # Brightness and gamma are applied through one lookup table.
+
+    def __init__(self, pin, index_map, byteorder='GRB', brightness=1,
+                 gamma=1):
+        super().__init__()
+        import digitalio
+        from neopixel_write import neopixel_write
+        self.neopixel_write = neopixel_write
+        self.pin = digitalio.DigitalInOut(pin)
+        self.pin.direction = digitalio.Direction.OUTPUT
+        # byte buffer sent to the strip, filled from the frame in strip order
+        self.strip = bytearray(index_map.size * 3)
+        self.data = np.frombuffer(self.strip, dtype=np.uint8)
+        self.gather = framebuffer.strip_gather(index_map, byteorder)
+        self.gamma = gamma
+        self.set_brightness(brightness)
+
+    def set_brightness(self, brightness):
+        self.brightness = brightness
+        if brightness == 1 and self.gamma == 1:
+            self.lut = None
+        else:
+            self.lut = palette.output_lut(brightness, self.gamma)
+
+    def write(self, frame):
+        framebuffer.to_strip(frame, self.gather, self.data, self.lut)
+        self.neopixel_write(self.pin, self.strip)
+        return len(self.strip)
+
+
+class PygameBackend(Backend):
+    # Simulation window, every LED is drawn as a size x size box with a one
+    # pixel gap around it. The frame is copied into a surface with one
+    # pixel per LED through surfarray, scaled up in a single call and
+    # covered by a cached grid mask, text overlays are blitted last. Only
+    # the part of the window that changed since the last frame is updated
+    # on screen.
+
+    def __init__(self, surface, size, background=(0, 0, 0)):
+        super().__init__()
+        self.surface = surface
+        self.size = size
+        self.background = background
+        # surfaces for the current frame size, see prepare()
+        self.small = None
+        self.last = None
+        # text drawn over the frame, and where it was on the last one
+        self.overlays = []
+        self.overlay_rects = []
+
+    def set_overlays(self, overlays):
+        self.overlays = overlays
+
+    def prepare(self, width, height):
+        size = self.size
+        self.small = pygame.Surface((width, height), 0, 24)
+        self.scaled = pygame.Surface((width*size, height*size), 0, self.small)
+        # background coloured gaps, transparent where the LEDs show through
+        key = (255, 0, 255) if tuple(self.background) != (255, 0, 255) \
+            else (0, 255, 0)
+        self.grid = pygame.Surface((width*size, height*size))
+        self.grid.fill(key)
+        for x in range(width):
+            for edge in (x*size, x*size + size - 1):
+                self.grid.fill(self.background, (edge, 0, 1, height*size))
+        for y in range(height):
+            for edge in (y*size, y*size + size - 1):
+                self.grid.fill(self.background, (0, edge, width*size, 1))
+        self.grid.set_colorkey(key)
+        self.last = None
+
+    def changed(self, frame):
+        # window area of the cells that differ from the last frame
+        size = self.size
+        if self.last is None:
+            return self.scaled.get_rect()
+        cells = np.any(frame != self.last, axis=2)
+        rows = np.flatnonzero(cells.any(axis=1))
+        if not rows.size:
+            return None
+        cols = np.flatnonzero(cells.any(axis=0))
+        return pygame.Rect(cols[0]*size, rows[0]*size,
+                           (cols[-1] - cols[0] + 1)*size,
+                           (rows[-1] - rows[0] + 1)*size)
+
+    def write(self, frame):
+        height, width = frame.shape[:2]
+        if self.small is None or self.small.get_size() != (width, height):
+            self.prepare(width, height)
+        pygame.surfarray.blit_array(self.small, frame.transpose(1, 0, 2))
+        pygame.transform.scale(self.small, self.scaled.get_size(),
+                               self.scaled)
+        self.surface.blit(self.scaled, (0, 0))
+        self.surface.blit(self.grid, (0, 0))
+        rects = [self.surface.blit(surf, rect) for surf, rect in self.overlays]
+        rect = self.changed(frame)
+        # old text is painted over by the frame, new text is drawn last
+        dirty = ([] if rect is None else [rect]) + self.overlay_rects + rects
+        if dirty:
+            pygame.display.update(dirty[0].unionall(dirty[1:]))
+        self.overlay_rects = rects
+        if self.last is None:
+            self.last = frame.copy()
+        else:
+            self.last[:] = frame
+        return frame.nbytes
+
+
+class HeadlessBackend(Backend):
+    # Keeps the pushed frames in memory instead of showing them, for
+    # running and measuring without any display. keep limits the number
+    # of stored frames, None stores all of them.
+
+    def __init__(self, keep=None):
+        super().__init__()
+        self.frames = deque(maxlen=keep)
+
+    def write(self, frame):
+        self.frames.append(frame.copy())
+        return frame.nbytes
+
+    def last(self):
+        return self.frames[-1] if self.frames else None
+
+    def clear(self):
+        self.frames.clear()
+        for key in self.stats:
+            self.stats[key] = 0
+
+
+class Tile(Backend):
+    # One panel of a wall made of several matrices: pushes the width x
+    # height part of the frame starting at (x, y) to the panel's own
+    # backend. A Display as large as the whole wall gets one Tile output
+    # per panel.
+
+    def __init__(self, backend, x, y, width, height):
+        super().__init__()
+        self.backend = backend
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def set_brightness(self, brightness):
+        self.backend.set_brightness(brightness)
+
+    def set_overlays(self, overlays):
+        self.backend.set_overlays(overlays)
+
+    def write(self, frame):
+        return self.backend.write(
+            frame[self.y:self.y + self.height, self.x:self.x + self.width])
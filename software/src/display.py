@@ -0,0 +1,332 @@
+import numpy as np
+
+from . import main
+from . import framebuffer
+from . import assets
+from . import scoreboard
+from . import profiling
+from . import glyphs
+
+# every display created, for the statistics report
+DISPLAYS = []
+
+
+class Display:
+    # One LED matrix and what belongs to it: the framebuffer all drawing
+    # goes into, its geometry and serpentine mapping, the outputs frames
+    # are pushed to and the optional MAX7219 scoreboard (device) or
+    # simulation window (surface). Several panels driven as one wall share
+    # a single Display with one backends.Tile output per panel.
+    #
+    # An indexed display keeps one palette index per pixel instead of an
+    # RGB triple and expands the frame through its palette table only when
+    # it is pushed. Index 0 is the background, then come the variants of
+    # main.PALETTES in blocks of len(main.COLORS) and colours reserved for
+    # palette animation. The remaining entries are handed out to image and
+    # RGB colours from the top as they are drawn. When they run out, the
+    # ones not on screen any more are freed again.
+
+    def __init__(self, width, height, outputs=(), device=None, surface=None,
+                 indexed=False):
+        self.width = width
+        self.height = height
+        self.indexed = indexed
+        self.serpentine = framebuffer.serpentine_map(width, height)
+        self.outputs = list(outputs)
+        self.device = device
+        self.surface = surface
+        # copy of the last frame sent out, unchanged frames are not pushed
+        self.last_frame = None
+        # (text, surface, rect) drawn over the next frame in the simulation
+        # window, and the texts drawn over the last one
+        self.texts = []
+        self.last_texts = []
+        self.palette_changed = False
+        if indexed:
+            self.frame = framebuffer.new_indexed_frame(width, height)
+            self.rgb = framebuffer.new_frame(width, height)
+            self.palette = np.zeros((256, 3), dtype=np.uint8)
+            self.color_indices = {}
+            self.offsets = {}
+            # image id -> (image, key, indices, visible mask)
+            self.images = {}
+            self.colors_used = 0
+            # lowest index handed out to an image or RGB colour
+            self.dynamic = len(self.palette)
+            self.reclaimed = 0
+            self.background = self.reserveColor(main.BGCOLOR)
+            for variant, colors in main.PALETTES.items():
+                self.offsets[variant] = self.colors_used
+                for rgb in colors:
+                    self.reserveColor(rgb)
+        else:
+            self.frame = framebuffer.new_frame(width, height)
+            self.background = main.BGCOLOR
+        DISPLAYS.append(self)
+
+    def addOutput(self, backend):
+        # the next frame is pushed to every output, changed or not
+        self.outputs.append(backend)
+        self.last_frame = None
+
+    def setOutput(self, backend):
+        self.outputs = []
+        self.addOutput(backend)
+
+    def setBrightness(self, brightness):
+        # e.g. dimming at night, the next frame is pushed at the new level
+        for output in self.outputs:
+            output.set_brightness(brightness)
+        self.last_frame = None
+
+    def stats(self):
+        totals = {'pushed': 0, 'skipped': 0, 'bytes': 0}
+        for output in self.outputs:
+            for key in totals:
+                totals[key] += output.stats[key]
+        return totals
+
+    # palette #
+
+    def reserveColor(self, rgb):
+        # new palette index for rgb, e.g. for palette animation
+        if self.colors_used == self.dynamic:
+            self.reclaimColors()
+        if self.colors_used == self.dynamic:
+            raise ValueError("palette full")
+        index = self.colors_used
+        self.colors_used += 1
+        self.palette[index] = rgb
+        self.color_indices.setdefault(tuple(rgb), index)
+        return index
+
+    def setPaletteColor(self, index, rgb):
+        # every pixel with this index changes colour on the next push
+        self.palette[index] = rgb
+        self.palette_changed = True
+
+    def colorIndex(self, rgb):
+        # palette index of rgb, the nearest colour once the palette is full,
+        # see makeRoom
+        rgb = tuple(int(c) for c in rgb)
+        index = self.color_indices.get(rgb)
+        if index is not None:
+            return index
+        if self.colors_used < self.dynamic:
+            self.dynamic -= 1
+            self.palette[self.dynamic] = rgb
+            self.color_indices[rgb] = self.dynamic
+            return self.dynamic
+        distance = np.sum((self.palette.astype(np.int32) - rgb) ** 2, axis=1)
+        return int(np.argmin(distance))
+
+    def makeRoom(self, colors):
+        # free the image and RGB colours if the new ones among colors do not
+        # fit into the palette any more
+        new = sum(1 for rgb in colors
+                  if tuple(int(c) for c in rgb) not in self.color_indices)
+        if new > self.dynamic - self.colors_used:
+            self.reclaimColors()
+
+    def reclaimColors(self):
+        # free the image and RGB colours, then hand out new entries to the
+        # ones still in the frame
+        if self.reclaimed == 0:
+            print("Palette full, freeing image colours")
+        self.reclaimed += 1
+        drawn = self.frame >= self.dynamic
+        colors = self.palette[self.frame[drawn]]
+        self.color_indices = {rgb: index
+                              for rgb, index in self.color_indices.items()
+                              if index < self.dynamic}
+        self.images.clear()
+        self.dynamic = len(self.palette)
+        if colors.size:
+            colors, inverse = np.unique(colors, axis=0, return_inverse=True)
+            lut = np.array([self.colorIndex(rgb) for rgb in colors],
+                           dtype=np.uint8)
+            self.frame[drawn] = lut[inverse.reshape(-1)]
+        # the indices of the colours on screen changed
+        self.palette_changed = True
+
+    def indexImage(self, image, key=None):
+        # image as palette indices and the mask of the pixels to draw, RGBA
+        # images are not blended but cut off at half transparency
+        cache_key = (id(image), None if key is None else tuple(key))
+        cached = self.images.get(cache_key)
+        if cached is not None and cached[0] is image:
+            return cached[2], cached[3]
+        colors, inverse = np.unique(image[..., :3].reshape(-1, 3), axis=0,
+                                    return_inverse=True)
+        self.makeRoom(colors)
+        lut = np.array([self.colorIndex(rgb) for rgb in colors],
+                       dtype=np.uint8)
+        indices = lut[inverse.reshape(-1)].reshape(image.shape[:2])
+        if image.shape[2] == 4:
+            visible = image[..., 3] >= 128
+        elif key is not None:
+            visible = np.any(image != key, axis=2)
+        else:
+            visible = None
+        if len(self.images) >= assets.CACHE_SIZE:
+            self.images.clear()
+        # the image is kept so its id is not reused while cached
+        self.images[cache_key] = (image, key, indices, visible)
+        return indices, visible
+
+    def ink(self, color, variant='normal'):
+        # frame value of the main.COLORS entry color
+        if self.indexed:
+            return self.offsets[variant] + color
+        return main.PALETTES[variant][color]
+
+    # LED matrix #
+
+    def clearScreen(self):
+        self.frame[:] = self.background
+
+    @profiling.span('updateScreen')
+    def updateScreen(self, force=False):
+        texts = [text for text, surf, rect in self.texts]
+        overlays = [(surf, rect) for text, surf, rect in self.texts]
+        self.texts = []
+        if not force and not self.palette_changed \
+                and texts == self.last_texts \
+                and self.last_frame is not None \
+                and np.array_equal(self.frame, self.last_frame):
+            for output in self.outputs:
+                output.skip()
+            return
+        self.last_texts = texts
+        if self.last_frame is None:
+            self.last_frame = self.frame.copy()
+        else:
+            self.last_frame[:] = self.frame
+        frame = self.frame
+        if self.indexed:
+            frame = framebuffer.expand(self.frame, self.palette, self.rgb)
+            self.palette_changed = False
+        for output in self.outputs:
+            output.set_overlays(overlays)
+            output.push(frame)
+
+    def clearRect(self, x, y, width, height):
+        x0, y0 = max(x, 0), max(y, 0)
+        self.frame[y0:y + height, x0:x + width] = self.background
+
+    def drawPixel(self, x, y, color, variant='normal'):
+        # color is an index into main.COLORS, variant one of the palettes
+        # in main.PALETTES
+        if color == main.BLANK:
+            return
+        if 0 <= x < self.width and 0 <= y < self.height and color >= 0:
+            self.frame[y, x] = self.ink(color, variant)
+
+    def drawChanges(self, changes):
+        # {(x, y): (color, variant)} from a game, BLANK clears the cell
+        for (x, y), (color, variant) in changes.items():
+            if color == main.BLANK:
+                if 0 <= x < self.width and 0 <= y < self.height:
+                    self.frame[y, x] = self.background
+            else:
+                self.drawPixel(x, y, color, variant)
+
+    def drawDarkPixel(self, x, y, color):
+        self.drawPixel(x, y, color, 'ghost')
+
+    def drawPixelRgb(self, x, y, r, g, b):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            if self.indexed:
+                self.makeRoom([(r, g, b)])
+                self.frame[y, x] = self.colorIndex((r, g, b))
+            else:
+                self.frame[y, x] = (r, g, b)
+
+    def drawCells(self, cells, x=0, y=0):
+        # rows of main.COLORS indices in one go, BLANK cells are left out
+        values = np.array([[-1 if c == main.BLANK else c for c in row]
+                           for row in cells], dtype=np.int16)
+        visible = values >= 0
+        if self.indexed:
+            values = (values + self.offsets['normal']).astype(np.uint8)
+        else:
+            values = main.PALETTES['normal'][np.maximum(values, 0)]
+        framebuffer.paste(self.frame, values, x, y, visible)
+
+    def drawImage(self, filename, x=0, y=0, key=None):
+        image = assets.load(filename)
+        if self.indexed:
+            indices, visible = self.indexImage(image, key)
+            framebuffer.paste(self.frame, indices, x, y, visible)
+        else:
+            framebuffer.blit(self.frame, image, x, y, key)
+
+    def drawHalfImage(self, filename, offset):
+        im = assets.load(filename)
+        if self.indexed:
+            indices, visible = self.indexImage(im)
+            if visible is not None:
+                visible = visible[:10, :10]
+            framebuffer.paste(self.frame, indices[:10, :10], 0,
+                              min(offset, 10), visible)
+        else:
+            framebuffer.blit(self.frame, im[:10, :10], 0, min(offset, 10))
+
+    def drawGlyph(self, glyph, x, y, color):
+        # glyph is a boolean mask from the glyphs atlas
+        if color == main.BLANK or color < 0:
+            return
+        framebuffer.stamp(self.frame, glyph, x, y, self.ink(color))
+
+    def drawnumber(self, number, offsetx, offsety, color):
+        self.drawGlyph(glyphs.DIGITS[number], offsetx, offsety, color)
+
+    def draw_bin_number_main_menu(self, number, offsetx, offsety, color):
+        # number (0-99) as two columns of binary digits, tens on the left
+        self.drawGlyph(glyphs.BINARY[number], offsetx, offsety, color)
+
+    # dot matrix #
+    # These only post to the scoreboard worker, the main.render_* functions
+    # do the actual drawing and SPI transfer there. Without a device they
+    # do nothing, the text ones draw into the simulation window instead.
+
+    def matrix_text(self, text, offset=(0, 0)):
+        if self.device is not None:
+            scoreboard.post(main.render_matrix_text, self.device, text,
+                            offset, key=self.device)
+
+    def matrix_image(self, image):
+        if self.device is not None:
+            scoreboard.post(main.render_matrix_image, self.device, image,
+                            key=self.device)
+
+    def matrix_clear(self):
+        if self.device is not None:
+            scoreboard.post(main.render_matrix_clear, self.device,
+                            key=self.device)
+
+    def scroll_text(self, text):
+        if self.device is not None:
+            scoreboard.post(main.render_scroll_text, self.device, text,
+                            key=self.device)
+        elif self.surface is not None:
+            self.drawSurfaceText(text)
+
+    def scoreText(self, score):
+        _score = score
+        if _score > 999:
+            _score = 999
+        if self.device is not None:
+            scoreboard.post(main.render_score_text, self.device, _score,
+                            key=self.device)
+        elif self.surface is not None:
+            self.drawSurfaceText(_score)
+
+    def drawSurfaceText(self, text):
+        # shown over the next frame pushed, the window is repainted from
+        # the framebuffer on every push
+        titleSurf, titleRect = main.makeTextObjs(
+            str(text), main.BASICFONT, main.TEXTCOLOR)
+        titleRect.center = (int(self.surface.get_width() / 2) - 3,
+                            int(self.surface.get_height() / 2) - 3)
+        self.texts.append((str(text), titleSurf, titleRect))
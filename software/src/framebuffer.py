@@ -0,0 +1,93 @@
+import numpy as np
+
+
+def new_frame(width, height):
+    # one RGB triple per LED, addressed as frame[y, x]
+    return np.zeros((height, width, 3), dtype=np.uint8)
+
+
+def new_indexed_frame(width, height):
+    # one palette index per LED, addressed as frame[y, x]
+    return np.zeros((height, width), dtype=np.uint8)
+
+
+def expand(frame, table, out):
+    # RGB frame of an indexed frame, table holds one colour per index
+    return np.take(table, frame, axis=0, out=out)
+
+
+def serpentine_map(width, height):
+    # strip index of every (y, x) cell. The strip runs through the matrix
+    # column by column, bottom-up on even and top-down on odd columns.
+    index = np.empty((height, width), dtype=np.intp)
+    for x in range(width):
+        column = np.arange(x * height, (x + 1) * height)
+        index[:, x] = column if x % 2 == 1 else column[::-1]
+    return index
+
+
+def strip_gather(index_map, byteorder='GRB'):
+    # flat frame offsets listed in the order the strip expects its bytes,
+    # so a whole frame becomes strip data with a single np.take
+    cells = np.argsort(index_map, axis=None)
+    channels = np.array(['RGB'.index(c) for c in byteorder])
+    return (cells[:, None] * 3 + channels).ravel()
+
+
+def to_strip(frame, gather, out, lut=None):
+    # strip data for frame, mapped through the palette.output_lut table
+    np.take(frame.reshape(-1), gather, out=out)
+    if lut is not None:
+        np.take(lut, out, out=out)
+    return out
+
+
+def blit(frame, image, x=0, y=0, key=None):
+    # copy image into frame with its top left corner at (x, y), clipped to
+    # the frame. RGBA images are alpha blended, pixels matching the colour
+    # key are left out.
+    height, width = frame.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1 = min(x + image.shape[1], width)
+    y1 = min(y + image.shape[0], height)
+    if x0 >= x1 or y0 >= y1:
+        return
+    src = image[y0 - y:y1 - y, x0 - x:x1 - x]
+    dst = frame[y0:y1, x0:x1]
+    if src.shape[2] == 4:
+        alpha = src[..., 3:].astype(np.uint16)
+        dst[:] = (src[..., :3] * alpha + dst * (255 - alpha) + 127) // 255
+    elif key is not None:
+        visible = np.any(src != key, axis=2)
+        dst[visible] = src[visible]
+    else:
+        dst[:] = src
+
+
+def paste(frame, values, x=0, y=0, visible=None):
+    # copy values into frame with its top left corner at (x, y), clipped
+    # to the frame. Only the pixels set in the visible mask are copied.
+    height, width = frame.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1 = min(x + values.shape[1], width)
+    y1 = min(y + values.shape[0], height)
+    if x0 >= x1 or y0 >= y1:
+        return
+    src = values[y0 - y:y1 - y, x0 - x:x1 - x]
+    if visible is None:
+        frame[y0:y1, x0:x1] = src
+    else:
+        visible = visible[y0 - y:y1 - y, x0 - x:x1 - x]
+        frame[y0:y1, x0:x1][visible] = src[visible]
+
+
+def stamp(frame, mask, x, y, color):
+    # set the pixels of the boolean mask to color, with its top left
+    # corner at (x, y) and clipped to the frame
+    height, width = frame.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1 = min(x + mask.shape[1], width)
+    y1 = min(y + mask.shape[0], height)
+    if x0 >= x1 or y0 >= y1:
+        return
+    frame[y0:y1, x0:x1][mask[y0 - y:y1 - y, x0 - x:x1 - x]] = color
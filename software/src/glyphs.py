@@ -0,0 +1,66 @@
+import numpy as np
+from PIL import Image
+
+# Glyph atlas: the clock digits, the binary clock nibbles and the tetris
+# piece icons are decoded from their font tables once at import. The LED
+# matrix draws them as boolean masks with framebuffer.stamp, the dot
+# matrix as 1 bit PIL images with a single draw.bitmap.
+
+# font clock #
+# one byte per column, bit y set when row y is lit
+
+clock_font = [
+    0x1F, 0x11, 0x1F,
+    0x00, 0x00, 0x1F,
+    0x1D, 0x15, 0x17,
+    0x15, 0x15, 0x1F,
+    0x07, 0x04, 0x1F,
+    0x17, 0x15, 0x1D,
+    0x1F, 0x15, 0x1D,
+    0x01, 0x01, 0x1F,
+    0x1F, 0x15, 0x1F,
+    0x17, 0x15, 0x1F]
+
+theTetrisFont = [
+    0x78, 0x78, 0x1E, 0x1E,  # S
+    0x1E, 0x1E, 0x78, 0x78,  # Z
+    0x00, 0xFF, 0xFF, 0x00,  # I
+    0x06, 0x06, 0x7E, 0x7E,  # J
+    0x7E, 0x7E, 0x06, 0x06,  # L
+    0x3C, 0x3C, 0x3C, 0x3C,  # O
+    0x7E, 0x7E, 0x18, 0x18,  # T
+]
+
+
+def decode(columns, height):
+    # (height, len(columns)) boolean mask from a column font
+    rows = np.arange(height)
+    return (np.array(columns)[None, :] >> rows[:, None] & 1).astype(bool)
+
+
+def to_bitmap(glyph):
+    return Image.fromarray(glyph.astype(np.uint8) * 255).convert('1')
+
+
+def binary(number):
+    # tens and ones of number as two columns of 4 bits, most significant
+    # bit at the top
+    rows = np.arange(3, -1, -1)[:, None]
+    return (np.array([number // 10, number % 10])[None, :] >> rows & 1) \
+        .astype(bool)
+
+
+# 3x5 digits 0-9
+DIGITS = [decode(clock_font[3*n:3*n + 3], 5) for n in range(10)]
+# 2x4 binary clock values 0-99
+BINARY = [binary(n) for n in range(100)]
+
+# The dot matrix is mounted mirrored, drawScorePixel draws (x, y) at
+# (31 - x, y). Digits are drawn mirrored as well, so they end up upright,
+# the piece icons end up flipped.
+DIGIT_BITMAPS = [to_bitmap(glyph) for glyph in DIGITS]
+PIECE_BITMAPS = [to_bitmap(decode(theTetrisFont[4*n:4*n + 4], 8)[:, ::-1])
+                 for n in range(len(theTetrisFont) // 4)]
+
+for glyph in DIGITS + BINARY:
+    glyph.flags.writeable = False
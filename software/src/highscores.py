@@ -0,0 +1,122 @@
+import json
+import os
+import pickle
+import threading
+
+from . import INSTALL_DIR
+
+# Highscores of all games, loaded once and kept in memory. Changes are
+# written by a background thread (write-behind), so a game over never
+# waits for the SD card. The file is replaced with an atomic rename, a
+# power loss leaves either the old or the new table, never a torn one.
+# Without the writer thread scores are only kept in memory.
+
+FILE = f'{INSTALL_DIR}/highscores.json'
+# scores kept per game
+TOP_N = 10
+# single score pickles written by earlier versions, imported once
+LEGACY_FILES = {'tetris': f'{INSTALL_DIR}/hs_tetris.p',
+                'snake': f'{INSTALL_DIR}/hs_snake.p'}
+
+_cond = threading.Condition()
+# game -> scores, highest first
+_tables = None
+_dirty = False
+_busy = False
+_thread = None
+
+
+def _read():
+    try:
+        with open(FILE) as f:
+            return {game: sorted(scores, reverse=True)[:TOP_N]
+                    for game, scores in json.load(f).items()}
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"highscores: {e}")
+    tables = {}
+    for game, path in LEGACY_FILES.items():
+        try:
+            with open(path, 'rb') as f:
+                tables[game] = [int(pickle.load(f))]
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            pass
+    return tables
+
+
+def load():
+    # read the file on first use, later calls return the cached tables
+    global _tables
+    with _cond:
+        if _tables is None:
+            _tables = _read()
+        return _tables
+
+
+def table(game):
+    return list(load().get(game, []))
+
+
+def best(game):
+    scores = load().get(game)
+    return scores[0] if scores else 0
+
+
+def submit(game, score):
+    # enter a finished game's score, True if it is a new highscore
+    global _dirty
+    if score <= 0:
+        return False
+    tables = load()
+    with _cond:
+        scores = tables.setdefault(game, [])
+        record = not scores or score > scores[0]
+        if len(scores) < TOP_N or score > scores[-1]:
+            scores.append(score)
+            scores.sort(reverse=True)
+            del scores[TOP_N:]
+            _dirty = True
+            _cond.notify_all()
+    return record
+
+
+def flush(timeout=None):
+    # wait until every change has been written
+    with _cond:
+        if _thread is None:
+            return not _dirty
+        return _cond.wait_for(lambda: not _dirty and not _busy, timeout)
+
+
+def _write(tables):
+    tmp = f"{FILE}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(tables, f, separators=(',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, FILE)
+
+
+def _run():
+    global _dirty, _busy
+    while True:
+        with _cond:
+            _busy = False
+            _cond.notify_all()
+            _cond.wait_for(lambda: _dirty)
+            tables = {game: list(scores) for game, scores in _tables.items()}
+            _dirty = False
+            _busy = True
+        try:
+            _write(tables)
+        except OSError as e:
+            print(f"highscores: {e}")
+
+
+def start():
+    global _thread
+    if _thread is not None:
+        return
+    _thread = threading.Thread(target=_run, name='highscores', daemon=True)
+    _thread.start()
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import deque
+
+import pygame
+
+from . import main
+from . import PI
+from . import profiling
+
+# (action, timestamp) pairs written by the input thread and drained by the
+# game loops. deque append and popleft are atomic, no lock is needed.
+QUEUE = deque(maxlen=64)
+# set whenever an action arrives, lets idle loops wake up early
+ARRIVED = threading.Event()
+# seconds every drained action spent in the queue
+WAIT_TIMES = deque(maxlen=256)
+# connected controllers by SDL instance id, kept up to date from the
+# JOYDEVICEADDED / JOYDEVICEREMOVED events
+JOYSTICKS = {}
+CONNECTED = threading.Event()
+
+_thread = None
+
+
+def start():
+    # SDL only pumps events on the thread that owns the window, so the
+    # input thread is used with the dummy video driver (Pi, headless)
+    # only. In the simulation window poll() reads the events instead.
+    global _thread
+    if _thread is not None or pygame.display.get_driver() != 'dummy':
+        return
+    _thread = threading.Thread(target=_run, name='input', daemon=True)
+    _thread.start()
+
+
+def _run():
+    while True:
+        try:
+            event = pygame.event.wait(100)
+        except pygame.error:
+            # pygame.quit() was called by terminate()
+            return
+        # the wait timed out, nothing to handle or time
+        if event.type != pygame.NOEVENT:
+            _handle(event)
+
+
+@profiling.span('input')
+def _handle(event):
+    if event.type == pygame.JOYDEVICEADDED:
+        joystick = pygame.joystick.Joystick(event.device_index)
+        JOYSTICKS[joystick.get_instance_id()] = joystick
+        CONNECTED.set()
+        print("Initialized joystick: {}".format(joystick.get_name()))
+        return
+    if event.type == pygame.JOYDEVICEREMOVED:
+        JOYSTICKS.pop(event.instance_id, None)
+        if not JOYSTICKS:
+            CONNECTED.clear()
+        print("Joystick disconnected")
+        return
+    if event.type == pygame.QUIT:
+        action = 'QUIT'
+    elif (not PI and event.type == pygame.KEYUP
+            and event.key == pygame.K_ESCAPE):
+        action = 'QUIT'
+    else:
+        action = main.get_action(event)
+    if action:
+        post(action)
+
+
+def post(action):
+    QUEUE.append((action, time.perf_counter()))
+    ARRIVED.set()
+
+
+@profiling.span('poll')
+def poll():
+    # Return all actions that arrived since the last call, never blocks.
+    # Without the input thread the pending pygame events are read here.
+    if _thread is None:
+        pygame.event.pump()
+        for event in pygame.event.get():
+            _handle(event)
+    ARRIVED.clear()
+    actions = []
+    now = time.perf_counter()
+    while QUEUE:
+        action, stamp = QUEUE.popleft()
+        WAIT_TIMES.append(now - stamp)
+        if action == 'QUIT':
+            main.terminate()
+        actions.append(action)
+    return actions
+
+
+def joystick():
+    # first connected controller, or None
+    joysticks = list(JOYSTICKS.values())
+    return joysticks[0] if joysticks else None
+
+
+def wait_for_joystick(timeout=None):
+    CONNECTED.wait(timeout)
+    return joystick()
+
+
+def latency():
+    # median and worst time an action waited before a loop picked it up
+    if not WAIT_TIMES:
+        return None
+    waits = sorted(WAIT_TIMES)
+    return {'median_ms': 1000 * waits[len(waits) // 2],
+            'max_ms': 1000 * waits[-1]}
+
+
+def report():
+    stats = latency()
+    if stats is None:
+        return "input: no actions"
+    return ("input: waited {median_ms:.1f} ms "
+            "(max {max_ms:.1f} ms)").format(**stats)
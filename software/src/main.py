@@ -7,38 +7,49 @@
 # http://inventwithpython.com/pygame
 # Released under a "Simplified BSD" license
 
+# first, so the startup report includes the imports
+from . import startup
+
 import pygame
 import time
 import os
 import subprocess
-from PIL import Image, ImageFont, ImageDraw
+import threading
 from pygame.display import update
 from pygame.draw import circle
 
-from . import PI, INSTALL_DIR, RES_DIR
+from . import PI, INSTALL_DIR, RES_DIR, BACKEND
 from .tetris import runTetrisGame
 from .snake import runSnakeGame
 from . import clock
+from . import assets
+from . import scheduler
+from . import inputs
+from . import scoreboard
+from . import highscores
+from . import backends
+from . import profiling
+from . import glyphs
+from . import palette
+from . import display as displays
 
 # If Pi = False the script runs in simulation mode using pygame lib
 if PI:
     # dummy display for pygame joystick usage
     os.environ["SDL_VIDEODRIVER"] = "dummy"
-    import board
-    import neopixel
-    from luma.led_matrix.device import max7219
-    from luma.core.interface.serial import spi, noop
-    from luma.core.render import canvas
-    from luma.core.virtual import viewport
-    from luma.core.legacy import text, show_message
-    from luma.core.legacy.font import proportional, CP437_FONT, TINY_FONT, SINCLAIR_FONT, LCD_FONT
+# The hardware libraries (board, luma) are imported where they are first
+# used, so the boot splash does not wait for them.
 
 # only modify this two values for size adaption!
 PIXEL_X = 10
 PIXEL_Y = 20
 
 SIZE = 20
-FPS = 15
+# ticks per second of the menu loop
+FPS = 10
+CLOCK_FPS = 5
+# top left corner of the hour, minute and second digits of the clock
+CLOCK_DIGITS = ((2, 1), (6, 1), (2, 8), (6, 8), (2, 15), (6, 15))
 BOXSIZE = 20
 WINDOWWIDTH = BOXSIZE * PIXEL_X
 WINDOWHEIGHT = BOXSIZE * PIXEL_Y
@@ -46,9 +57,17 @@ BOARDWIDTH = PIXEL_X
 BOARDHEIGHT = PIXEL_Y
 BLANK = '.'
 LED_BRIGHTNESS = 1
+# 1 sends the colours as they are, around 2.2 gives evenly spaced fades
+# on WS2812 LEDs but also makes the ghost piece very dim
+LED_GAMMA = 1
+# keep one palette index per LED instead of RGB, see display.Display
+INDEXED = False
 
-# Small Font used for the 8x8 dot matrix display
-PIXELFONT = ImageFont.truetype(f"{RES_DIR}/font/arriva-7x3.ttf", 8)
+# Small Font used for the 8x8 dot matrix display, loaded on first use
+PIXELFONT = f"{RES_DIR}/font/arriva-7x3.ttf"
+PIXELFONT_SIZE = 8
+# (step, exception) when loadResources failed on the loader thread
+LOAD_ERROR = None
 
 
 #               R    G    B
@@ -85,47 +104,10 @@ DARKCOLORS = (DARKBLUE, DARKGREEN, DARKRED, DARKYELLOW,
               DARKCYAN, DARKMAGENTA, DARKORANGE)
 LIGHTCOLORS = (LIGHTBLUE, LIGHTGREEN, LIGHTRED, LIGHTYELLOW)
 # assert len(COLORS) == len(LIGHTCOLORS) # each color must have light color
+# normal and ghost variants of COLORS, computed once
+PALETTES = palette.variants(COLORS)
 
 
-# font clock #
-
-clock_font = [
-    0x1F, 0x11, 0x1F,
-    0x00, 0x00, 0x1F,
-    0x1D, 0x15, 0x17,
-    0x15, 0x15, 0x1F,
-    0x07, 0x04, 0x1F,
-    0x17, 0x15, 0x1D,
-    0x1F, 0x15, 0x1D,
-    0x01, 0x01, 0x1F,
-    0x1F, 0x15, 0x1F,
-    0x17, 0x15, 0x1F]
-
-theTetrisFont = [
-    0x78, 0x78, 0x1E, 0x1E,  # S
-    0x1E, 0x1E, 0x78, 0x78,  # Z
-    0x00, 0xFF, 0xFF, 0x00,  # I
-    0x06, 0x06, 0x7E, 0x7E,  # J
-    0x7E, 0x7E, 0x06, 0x06,  # L
-    0x3C, 0x3C, 0x3C, 0x3C,  # O
-    0x7E, 0x7E, 0x18, 0x18,  # T
-]
-
-DEVICE = None
-PIXELS = None
-
-if PI:
-    serial = spi(port=0, device=0, gpio=noop())
-    DEVICE = max7219(serial, cascaded=4,
-                     blocks_arranged_in_reverse_order=False)
-    pixel_pin = board.D18
-    # The number of NeoPixels
-    num_pixels = PIXEL_X*PIXEL_Y
-    order = neopixel.GRB
-    PIXELS = neopixel.NeoPixel(
-        pixel_pin, num_pixels, brightness=LED_BRIGHTNESS,
-        auto_write=False, pixel_order=order)
-
 # key server for controller #
 
 QKEYDOWN = 0
@@ -166,231 +148,253 @@ else:
     }
 
 
-mask = bytearray([1, 2, 4, 8, 16, 32, 64, 128])
-
-
 def main():
-    global FPSCLOCK, DISPLAYSURF, BASICFONT, BIGFONT
     global a1_counter, RUNNING
     a1_counter = 0
     RUNNING = True
-    joystick_cnt = 0
+    profiling.start()
+    startup.mark('imports')
 
+    # Only what the boot splash needs is set up here, everything else is
+    # loaded on a background thread while the splash is shown.
     if not PI:
-        pygame.init()
-        FPSCLOCK = pygame.time.Clock()
-        DISPLAYSURF = pygame.display.set_mode((PIXEL_X*SIZE, PIXEL_Y*SIZE))
-        BASICFONT = pygame.font.Font('freesansbold.ttf', 18)
-        BIGFONT = pygame.font.Font('freesansbold.ttf', 100)
-        pygame.display.set_caption('Pi Games')
-        DISPLAYSURF.fill(BGCOLOR)
-        pygame.display.update()
-        drawImage(f'{RES_DIR}/pi.bmp')
-        updateScreen()
-        time.sleep(2)
+        if BACKEND == 'headless':
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
     else:
         print("PI SETUP")
-        DEVICE.contrast(200)
-        pygame.init()
-        drawImage(f'{RES_DIR}/pi.bmp')
-        updateScreen()
-        pygame.joystick.init()
-        joystick_detected = False
-        while not joystick_detected:
-            # scroll_text("Waiting for controller...")
-            pygame.joystick.quit()
-            pygame.joystick.init()
-            try:
-                joystick = pygame.joystick.Joystick(
-                    0)  # create a joystick instance
-                joystick.init()  # init instance
-                print("Initialized joystick: {}".format(joystick.get_name()))
-                joystick_detected = True
-            except pygame.error:
-                print("no joystick found.")
-                joystick_detected = False
-
-    clearScreen()
-
-    drawClock(1)
-
-    # Check for joystick in the first loop
-    joystick_cnt = 45
+    pygame.display.init()
+    display = createDisplay()
+    if not PI:
+        pygame.display.set_caption('Pi Games')
+    startup.mark('display')
+    display.drawImage(f'{RES_DIR}/pi.bmp')
+    display.updateScreen()
+    startup.mark('splash')
+
+    loader = threading.Thread(target=loadResources, args=(display,),
+                              name='loader', daemon=True)
+    loader.start()
+    pygame.joystick.init()
+    inputs.start()
+    if PI:
+        # controllers are picked up by the input thread, wait for one
+        # without polling
+        if inputs.joystick() is None:
+            print("Waiting for controller...")
+        inputs.wait_for_joystick()
+    loader.join()
+    if LOAD_ERROR is not None:
+        step, error = LOAD_ERROR
+        print(f"Loading failed at: {step}")
+        raise error
+    startup.mark('ready')
+    print(startup.report())
+
+    display.clearScreen()
+
+    drawClock(display, 1)
+
     menu_selected = 0
+    menu_clock = scheduler.Scheduler('menu', FPS, wake=inputs.ARRIVED)
     while True:
         # select one of the three menu entries (Tetris, Snake, Clock)
-        clearScreen()
+        display.clearScreen()
         # drawSymbols()
-        drawImage(f'{RES_DIR}/menu{menu_selected}.bmp')
+        display.drawImage(f'{RES_DIR}/menu{menu_selected}.bmp')
         # draw color if clock menu is selected
         if menu_selected == 2:
-            clock.binary_clock_overlay(True)
+            clock.binary_clock_overlay(display, True)
         else:
-            clock.binary_clock_overlay()
-        updateScreen()
-        if not PI:
-            checkForQuit()
-
-        # check if joystick is still connected
-        if PI:
-            if joystick_cnt >= 45:
-                # print("CHECK FOR JOYSTICK")
-                joystick = check_joystick()
-                joystick_cnt = 0
-            else:
-                joystick_cnt += 1
-
-        pygame.event.pump()
-        for event in pygame.event.get():
+            clock.binary_clock_overlay(display)
+        display.updateScreen()
 
-            # Translate event to "action" string based on Controller / Keyboard
-            action = get_action(event)
+        # actions are translated from Controller / Keyboard events by the
+        # input thread, or by poll() in the simulation window
+        for action in inputs.poll():
 
             if action == 'DOWN':
-                joystick_cnt = - 50
                 menu_selected = (menu_selected + 1) % 3
             elif action == 'UP':
-                joystick_cnt = - 50
                 menu_selected = (menu_selected - 1) % 3
             elif action == 'START':
+                # stop a highscore message still scrolling
+                scoreboard.cancel()
                 if menu_selected == 0:
                     print("Starting Tetris")
-                    runTetrisGame()
-                    joystick = check_joystick()
-                    transition('circle', 26, 0.6, True)
-                    transition('menu', 5, 0.05)
+                    runTetrisGame(display)
+                    print(scheduler.SCHEDULERS['tetris'].report())
+                    transition(display, 'circle', 26, 0.6, True)
+                    transition(display, 'menu', 5, 0.05)
                 if menu_selected == 1:
                     print("Starting Snake")
-                    runSnakeGame()
-                    joystick = check_joystick()
-                    transition('circle', 26, 0.6, True)
-                    transition('menu', 5, 0.05)
+                    runSnakeGame(display)
+                    print(scheduler.SCHEDULERS['snake'].report())
+                    transition(display, 'circle', 26, 0.6, True)
+                    transition(display, 'menu', 5, 0.05)
                 if menu_selected == 2:
-                    transition('menu', 5, 0.05, True)
+                    transition(display, 'menu', 5, 0.05, True)
                     print("Starting Clock")
-                    drawClock(0)
-                    joystick = check_joystick()
+                    drawClock(display, 0)
 
                 # Remove any scores left over after a game
-                matrix_clear()
+                display.matrix_clear()
 
             elif action == 'SELECT':
-                shutdownScreen()
-                matrix_clear()
-
-            if event.type == pygame.QUIT:  # get all the QUIT events
-                terminate()  # terminate if any QUIT events are present
-        time.sleep(.1)
+                shutdownScreen(display)
+                display.matrix_clear()
+            if action in ('START', 'SELECT'):
+                # the nested loop is not part of this tick's work
+                menu_clock.reset()
+        menu_clock.wait()
 
     terminate()
 
 
-def drawClock(color):
-    joystick_cnt = 0
-
+def createDisplay():
+    # The LED matrix with its outputs. The MAX7219 scoreboard is attached
+    # later by loadResources. More matrices can be added to the returned
+    # display with backends.Tile outputs.
     if PI:
-        DEVICE.clear()
-        DEVICE.show()
+        import board
+        display = displays.Display(PIXEL_X, PIXEL_Y, indexed=INDEXED)
+        display.addOutput(backends.NeoPixelBackend(
+            board.D18, display.serpentine, 'GRB', LED_BRIGHTNESS,
+            LED_GAMMA))
+    else:
+        surface = pygame.display.set_mode((PIXEL_X*SIZE, PIXEL_Y*SIZE))
+        display = displays.Display(PIXEL_X, PIXEL_Y, surface=surface,
+                                   indexed=INDEXED)
+        if BACKEND == 'headless':
+            display.addOutput(backends.HeadlessBackend(keep=1))
+        else:
+            display.addOutput(
+                backends.PygameBackend(surface, SIZE, BGCOLOR))
+    return display
+
+
+def openScoreboard():
+    from luma.led_matrix.device import max7219
+    from luma.core.interface.serial import spi, noop
+    serial = spi(port=0, device=0, gpio=noop())
+    device = max7219(serial, cascaded=4,
+                     blocks_arranged_in_reverse_order=False)
+    device.contrast(200)
+    return device
 
-    hour = time.localtime().tm_hour
-    minute = time.localtime().tm_min
-    second = time.localtime().tm_sec
 
+def loadResources(display):
+    # runs on the loader thread while the boot splash is shown, a failure
+    # is kept in LOAD_ERROR together with the step and raised by main()
+    global BASICFONT, BIGFONT, LOAD_ERROR
+    step = 'highscores'
+    try:
+        highscores.load()
+        if PI:
+            highscores.start()
+            step = 'scoreboard'
+            display.device = openScoreboard()
+            scoreboard.start()
+            step = 'pixel font'
+            assets.load_font(PIXELFONT, PIXELFONT_SIZE)
+            startup.mark('scoreboard')
+        step = 'fonts'
+        pygame.font.init()
+        BASICFONT = pygame.font.Font('freesansbold.ttf', 18)
+        BIGFONT = pygame.font.Font('freesansbold.ttf', 100)
+        startup.mark('fonts')
+        step = 'assets'
+        assets.warm()
+        startup.mark('assets')
+    except Exception as e:
+        LOAD_ERROR = (step, e)
+
+
+def drawClock(display, color):
+    display.matrix_clear()
+
+    # The time only changes once a second: the loop sleeps until the next
+    # second starts (or input arrives) and redraws just the digits that
+    # changed since the last tick.
+    shown = [None] * len(CLOCK_DIGITS)
+    display.clearScreen()
+    clock_tick = scheduler.Scheduler(
+        'clock', 1, wake=inputs.ARRIVED, aligned=True)
     while True:
 
-        pygame.event.pump()
-        for event in pygame.event.get():  # User did something
-            action = get_action(event)
+        for action in inputs.poll():
             if action == 'START':
                 # print("exiting clock")
-                clearScreen()
-                updateScreen()
-                transition('circle', 26, 0.6)
-                transition('menu', 5, 0.05)
+                display.clearScreen()
+                display.updateScreen()
+                transition(display, 'circle', 26, 0.6)
+                transition(display, 'menu', 5, 0.05)
                 return
             if action in ['A', 'B', 'X', 'Y']:
                 color = color + 1
                 if (color > (len(COLORS) - 1)):
                     color = 0
-
-            if event.type == pygame.QUIT:  # get all the QUIT events
-                terminate()  # terminate if any QUIT events are present
-
-        # check if joystick is still connected
-        if PI:
-            if joystick_cnt == 15:
-                joystick_cnt = 0
-                joystick = check_joystick()
-            else:
-                joystick_cnt += 1
+                # new colour, redraw every digit
+                shown = [None] * len(CLOCK_DIGITS)
 
         ltime = time.localtime()
-        hour = ltime.tm_hour
-        minute = ltime.tm_min
-        second = ltime.tm_sec
-        clearScreen()
-
-        drawnumber(int(hour/10), 2, 1, color)
-        drawnumber(int(hour % 10), 6, 1, color)
-        drawnumber(int(minute/10), 2, 8, color)
-        drawnumber(int(minute % 10), 6, 8, color)
-        drawnumber(int(second/10), 2, 15, color)
-        drawnumber(int(second % 10), 6, 15, color)
+        digits = (ltime.tm_hour // 10, ltime.tm_hour % 10,
+                  ltime.tm_min // 10, ltime.tm_min % 10,
+                  ltime.tm_sec // 10, ltime.tm_sec % 10)
+        changed = False
+        for i, (x, y) in enumerate(CLOCK_DIGITS):
+            if digits[i] != shown[i]:
+                display.clearRect(x, y, 3, 5)
+                display.drawnumber(digits[i], x, y, color)
+                shown[i] = digits[i]
+                changed = True
 
-        updateScreen()
-        time.sleep(.2)
+        if changed:
+            display.updateScreen()
+        clock_tick.wait()
 
 
-def shutdownScreen():
+def shutdownScreen(display):
 
-    if PI:
-        DEVICE.clear()
-        DEVICE.show()
-        drawImage(f'{RES_DIR}/shutdown.bmp')
-        updateScreen()
-    else:
-        drawImage(f'{RES_DIR}/shutdown.bmp')
-        updateScreen()
+    display.matrix_clear()
+    display.drawImage(f'{RES_DIR}/shutdown.bmp')
+    display.updateScreen()
 
-    matrix_image("select_to")
+    display.matrix_image("select_to")
     counter = 0
+    shutdown_clock = scheduler.Scheduler(
+        'shutdown', CLOCK_FPS, wake=inputs.ARRIVED)
     while True:
 
         # Blinking "PAUSE"
         if counter == 8:
-            matrix_image("shutdown")
+            display.matrix_image("shutdown")
         if counter == 16:
-            matrix_image("select_to")
+            display.matrix_image("select_to")
             counter = 0
 
-        pygame.event.pump()
-        for event in pygame.event.get():  # User did something
-
-            action = get_action(event)
+        for action in inputs.poll():
             if action == 'START':
-                clearScreen()
-                updateScreen()
+                display.clearScreen()
+                display.updateScreen()
                 return
             elif action == 'SELECT':
                 if not PI:
                     terminate()
                 else:
-                    clearScreen()
-                    updateScreen()
-                    matrix_image("shutdown")
+                    display.clearScreen()
+                    display.updateScreen()
+                    display.matrix_image("shutdown")
                     subprocess.Popen(['shutdown', '-h', 'now'])
                     # call("sudo nohup shutdown -h now", shell=True)
                     terminate()
 
-            if event.type == pygame.QUIT:  # get all the QUIT events
-                terminate()  # terminate if any QUIT events are present
-
-        updateScreen()
+        display.updateScreen()
         counter += 1
-        time.sleep(.2)
+        shutdown_clock.wait()
 
 
-def transition(name, image_count, animation_time, reverse=False):
+def transition(display, name, image_count, animation_time,
+               reverse=False):
 
     print(f"ANIMATION: {name}")
 
@@ -398,155 +402,55 @@ def transition(name, image_count, animation_time, reverse=False):
         sleep_time = 0.02
     else:
         sleep_time = animation_time / image_count
+    animation_clock = scheduler.Scheduler('transition', 1 / sleep_time)
     for i in range(0, image_count - 1):
         if reverse:
-            drawImage(f'{RES_DIR}/animations/{name}/{image_count-1-i}.bmp')
+            display.drawImage(
+                f'{RES_DIR}/animations/{name}/{image_count-1-i}.bmp')
         else:
-            drawImage(f'{RES_DIR}/animations/{name}/{i}.bmp')
-        updateScreen()
-        time.sleep(sleep_time)
-
-
-def drawImage(filename):
-    im = Image.open(filename)
-    for row in range(0, BOARDHEIGHT):
-        for col in range(0, BOARDWIDTH):
-            r, g, b = im.getpixel((col, row))
-            drawPixelRgb(col, row, r, g, b)
-
+            display.drawImage(f'{RES_DIR}/animations/{name}/{i}.bmp')
+        display.updateScreen()
+        animation_clock.wait()
 
-def drawHalfImage(filename, offset):
-    im = Image.open(filename)
-    if offset > 10:
-        offset = 10
-    for row in range(0, 10):
-        for col in range(0, 10):
-            r, g, b = im.getpixel((col, row))
-            drawPixelRgb(col, row+offset, r, g, b)
 
-# drawing #
+# The render_* functions do the actual drawing and SPI transfer on the
+# scoreboard worker, the Display methods of the same name post them there.
 
-
-def matrix_text(text, offset=(0, 0)):
-    with canvas(DEVICE) as draw:
-        draw.text(offset, text, font=PIXELFONT, fill="white")
+def render_matrix_text(device, text, offset):
+    from luma.core.render import canvas
+    font = assets.load_font(PIXELFONT, PIXELFONT_SIZE)
+    with canvas(device) as draw:
+        draw.text(offset, text, font=font, fill="white")
 
 
-def matrix_image(image):
-    bitmap = Image.open(f"{RES_DIR}/dotmatrix/{image}.bmp")
-    with canvas(DEVICE)as draw:
+def render_matrix_image(device, image):
+    from luma.core.render import canvas
+    bitmap = assets.load_bitmap(f"{RES_DIR}/dotmatrix/{image}.bmp")
+    with canvas(device)as draw:
         draw.bitmap((0, 0), bitmap, fill='white')
 
 
-def matrix_clear():
-    with canvas(DEVICE) as draw:
+def render_matrix_clear(device):
+    from luma.core.render import canvas
+    with canvas(device) as draw:
         draw.rectangle((0, 0, 32, 8))
 
 
-def clearScreen():
-    if PI:
-        PIXELS.fill((0, 0, 0))
-    else:
-        DISPLAYSURF.fill(BGCOLOR)
-
-
-def updateScreen():
-    if PI:
-        PIXELS.show()
-    else:
-        pygame.display.update()
-
-
-def drawPixel(x, y, color):
-    if color == BLANK:
-        return
-    if PI:
-        try:
-            if (x >= 0 and y >= 0 and color >= 0):
-                if x % 2 == 1:
-                    PIXELS[x*PIXEL_Y+y] = COLORS[color]
-                else:
-                    PIXELS[x*PIXEL_Y+(PIXEL_Y-1-y)] = COLORS[color]
-        except Exception as e:
-            print(e)
-            print(str(x) + ' --- ' + str(y))
-    else:
-        pygame.draw.rect(
-            DISPLAYSURF, COLORS[color], (x*SIZE+1, y*SIZE+1, SIZE-2, SIZE-2))
-
-
-def drawDarkPixel(x, y, color):
-
-    if color == BLANK:
-        return
-
-    darkcolor = COLORS[color]
-    darkcolor = [int(darkcolor[0] * 0.1), int(darkcolor[1]
-                                              * 0.1), int(darkcolor[2] * 0.1)]
-    if PI:
-        try:
-            if (x >= 0 and y >= 0 and color >= 0):
-                if x % 2 == 1:
-                    PIXELS[x*PIXEL_Y+y] = darkcolor
-                else:
-                    PIXELS[x*PIXEL_Y+(PIXEL_Y-1-y)] = darkcolor
-        except:
-            print(str(x) + ' --- ' + str(y))
-    else:
-        pygame.draw.rect(
-            DISPLAYSURF, darkcolor, (x*SIZE+1, y*SIZE+1, SIZE-2, SIZE-2))
-
-
-def drawPixelRgb(x, y, r, g, b):
-    if PI:
-        if (x >= 0 and y >= 0):
-            if x % 2 == 1:
-                PIXELS[x*PIXEL_Y+y] = (r, g, b)
-            else:
-                PIXELS[x*PIXEL_Y+(PIXEL_Y-1-y)] = (r, g, b)
-    else:
-        pygame.draw.rect(DISPLAYSURF, (r, g, b),
-                         (x*SIZE+1, y*SIZE+1, SIZE-2, SIZE-2))
-
-
-def drawnumber(number, offsetx, offsety, color):
-    for x in range(0, 3):
-        for y in range(0, 5):
-            if clock_font[3*number + x] & mask[y]:
-                drawPixel(offsetx+x, offsety+y, color)
-
-
-def draw_bin_number_main_menu(bin_number, offsetx, offsety, color):
-    for x in range(0, 2):
-        for y in range(0, 4):
-            if bin_number[x][y] == 1:
-                drawPixel(offsetx+x, offsety+y, color)
-
+# offsets are given like for drawScorePixel, from the mirrored side
 
 def drawnumberMAX7219(number, offsetx, offsety, draw1):
-    for x in range(0, 3):
-        for y in range(0, 5):
-            if clock_font[3*number+2 - x] & mask[y]:
-                drawScorePixel(offsetx+x, offsety+y, 1, draw1)
-            elif clock_font[3*number+2 - x] & mask[y]:
-                drawScorePixel(offsetx+x, offsety+y, 0, draw1)
+    draw1.bitmap((29 - offsetx, offsety), glyphs.DIGIT_BITMAPS[number],
+                 fill="white")
 
 
 def drawTetrisMAX7219(piece, offsetx, offsety, draw1):
-    for x in range(0, 4):
-        for y in range(0, 8):
-            if theTetrisFont[4*piece + x] & mask[y]:
-                drawScorePixel(offsetx+x, offsety+y, 1, draw1)
-            elif theTetrisFont[4*piece + x] & mask[y]:
-                drawScorePixel(offsetx+x, offsety+y, 0, draw1)
+    draw1.bitmap((28 - offsetx, offsety), glyphs.PIECE_BITMAPS[piece],
+                 fill="white")
 
 
 def drawScorePixel(x, y, on, draw):
-    if PI:
-        draw.point((31-x, y), fill="white")
-        # time.sleep(.01)
-    else:
-        pygame.draw.rect(DISPLAYSURF, COLORS[2], (64-2*x, 410+2*y, 2, 2))
+    draw.point((31-x, y), fill="white")
+    # time.sleep(.01)
 
 
 def makeTextObjs(text, font, color):
@@ -554,30 +458,34 @@ def makeTextObjs(text, font, color):
     return surf, surf.get_rect()
 
 
-def scroll_text(text):
-    if PI:
-        show_message(DEVICE, text, fill="white", font=proportional(CP437_FONT))
-    else:
-        titleSurf, titleRect = makeTextObjs(str(text), BASICFONT, TEXTCOLOR)
-        titleRect.center = (int(WINDOWWIDTH / 2) - 3,
-                            int(WINDOWHEIGHT / 2) - 3)
-        DISPLAYSURF.blit(titleSurf, titleRect)
-
+def render_scroll_text(device, message, scroll_delay=0.03):
+    # like luma's show_message, but stops early when the scoreboard is
+    # cancelled
+    from luma.core.render import canvas
+    from luma.core.virtual import viewport
+    from luma.core.legacy import text, textsize
+    from luma.core.legacy.font import proportional, CP437_FONT
+    font = proportional(CP437_FONT)
+    w, h = textsize(message, font)
+    x = device.width
+    virtual = viewport(device, width=w + x + x, height=device.height)
+    with canvas(virtual) as draw:
+        text(draw, (x, 0), message, font=font, fill="white")
+    for i in range(0, w + x + 1):
+        if scoreboard.cancelled():
+            return
+        virtual.set_position((i, 0))
+        time.sleep(scroll_delay)
+
+
+def render_score_text(device, score):
+    from luma.core.render import canvas
+    from luma.core.legacy import text
+    with canvas(device) as draw:
+        for i in range(0, 3):
+            text(draw, ((3-i)*8, 0), str(score % 10), fill="white")
+            score //= 10
 
-def scoreText(score):
-    _score = score
-    if _score > 999:
-        _score = 999
-    if PI:
-        with canvas(DEVICE) as draw:
-            for i in range(0, 3):
-                text(draw, ((3-i)*8, 0), str(_score % 10), fill="white")
-                _score //= 10
-    else:
-        titleSurf, titleRect = makeTextObjs(str(_score), BASICFONT, TEXTCOLOR)
-        titleRect.center = (int(WINDOWWIDTH / 2) - 3,
-                            int(WINDOWHEIGHT / 2) - 3)
-        DISPLAYSURF.blit(titleSurf, titleRect)
 
 # program flow #
 
@@ -591,34 +499,19 @@ def get_action(event):
         return ""
 
 
-def check_joystick():
-    pygame.joystick.quit()
-    pygame.joystick.init()
-    try:
-        # create a joystick instance
-        joystick = pygame.joystick.Joystick(0)
-        joystick.init()  # init instance
-        # print("Initialized joystick: {}".format(joystick.get_name()))
-        return joystick
-    except pygame.error:
-        print("no joystick found.")
-        return None
-
-
 def terminate():
     RUNNING = False
+    for display in displays.DISPLAYS:
+        print("Frames pushed: {pushed}, skipped: {skipped}, "
+              "{bytes} bytes".format(**display.stats()))
+    print(scheduler.report())
+    print(inputs.report())
+    # let the last dot matrix message reach the display
+    scoreboard.flush(1)
+    highscores.flush(1)
     pygame.quit()
     exit()
 
 
-def checkForQuit():
-    for event in pygame.event.get(pygame.QUIT):  # get all the QUIT events
-        terminate()  # terminate if any QUIT events are present
-    for event in pygame.event.get(pygame.KEYUP):  # get all the KEYUP events
-        if event.key == pygame.K_ESCAPE:
-            terminate()  # terminate if the KEYUP event was for the Esc key
-        pygame.event.post(event)  # put the other KEYUP event objects back
-
-
 if __name__ == '__main__':
     main()
@@ -0,0 +1,27 @@
+import numpy as np
+
+# Colour pipeline. Games draw with indices into main.COLORS. The ghost
+# variant of that palette is derived once instead of per pixel. The LED
+# output maps every frame through a single 256 entry lookup table, which
+# holds gamma correction and brightness together.
+
+
+def scaled(colors, factor):
+    # every colour dimmed to factor, truncated like int()
+    palette = (np.array(colors, dtype=np.float64) * factor).astype(np.uint8)
+    palette.flags.writeable = False
+    return palette
+
+
+def variants(colors):
+    # the palettes drawing can choose from, as (len(colors), 3) arrays
+    return {'normal': scaled(colors, 1),
+            'ghost': scaled(colors, 0.1)}
+
+
+def output_lut(brightness=1, gamma=1):
+    # channel value -> value sent to the LEDs
+    levels = np.arange(256) / 255
+    lut = np.round(255 * brightness * levels ** gamma).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
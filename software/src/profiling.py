@@ -0,0 +1,119 @@
+import functools
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from time import perf_counter, sleep
+
+# Opt-in timing of the hot paths. Set LEDMATRIX_PROFILE=1 to print a
+# summary every INTERVAL seconds, or to a file name to also keep the
+# latest summary there as JSON. When it is not set, span() returns the
+# decorated function unchanged and measure() a shared no-op context.
+
+SETTING = os.environ.get('LEDMATRIX_PROFILE', '')
+ENABLED = SETTING not in ('', '0')
+STATS_FILE = SETTING if ENABLED and SETTING != '1' else None
+INTERVAL = 10
+
+# (name, start, duration) of the most recent spans
+RING = deque(maxlen=16384)
+# name -> [count, total seconds, max seconds] since startup
+TOTALS = {}
+
+_NULL = nullcontext()
+_reporter = None
+
+
+def record(name, start, duration):
+    RING.append((name, start, duration))
+
+
+def span(name):
+    # decorator timing every call of the function as span name
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, start, perf_counter() - start)
+        return timed
+    return decorate
+
+
+def measure(name):
+    # context manager timing a block as span name
+    if not ENABLED:
+        return _NULL
+    return _measure(name)
+
+
+@contextmanager
+def _measure(name):
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        record(name, start, perf_counter() - start)
+
+
+def summary(since=0.0, until=float('inf')):
+    # count, total, mean and max milliseconds per span started in the window
+    window = {}
+    for name, start, duration in list(RING):
+        if not since <= start < until:
+            continue
+        entry = window.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += duration
+        entry[2] = max(entry[2], duration)
+    return {name: {'count': count,
+                   'total_ms': 1000 * total,
+                   'mean_ms': 1000 * total / count,
+                   'max_ms': 1000 * longest}
+            for name, (count, total, longest) in sorted(window.items())}
+
+
+def _report(since, until):
+    stats = summary(since, until)
+    for name, entry in stats.items():
+        total = TOTALS.setdefault(name, [0, 0.0, 0.0])
+        total[0] += entry['count']
+        total[1] += entry['total_ms'] / 1000
+        total[2] = max(total[2], entry['max_ms'] / 1000)
+        print("profile: {name} n={count} mean {mean_ms:.3f} ms "
+              "max {max_ms:.3f} ms total {total_ms:.1f} ms".format(
+                  name=name, **entry))
+    if STATS_FILE:
+        tmp = f"{STATS_FILE}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'interval': stats,
+                       'totals': {name: {'count': c,
+                                         'total_ms': 1000 * t,
+                                         'max_ms': 1000 * m}
+                                  for name, (c, t, m) in TOTALS.items()}},
+                      f, indent=1)
+        os.replace(tmp, STATS_FILE)
+
+
+def _run():
+    since = perf_counter()
+    while True:
+        sleep(INTERVAL)
+        now = perf_counter()
+        _report(since, now)
+        since = now
+
+
+def start():
+    # start the periodic report, does nothing unless profiling is enabled
+    global _reporter
+    if not ENABLED or _reporter is not None:
+        return
+    _reporter = threading.Thread(target=_run, name='profile', daemon=True)
+    _reporter.start()
@@ -0,0 +1,102 @@
+import time
+from collections import deque
+
+from . import profiling
+
+# most recent scheduler of every loop, kept for the statistics report
+SCHEDULERS = {}
+
+
+class Scheduler:
+    # Fixed timestep pacing for the game loops. Every loop iteration is one
+    # logic tick and wait() only sleeps for what is left of it. A loop that
+    # falls behind is not slept at all, so its logic catches up, and
+    # render() tells it to skip drawing until it is back on time.
+    # With a wake event, wait() returns as soon as the event is set and the
+    # loop runs again before the tick is over, e.g. to react to input.
+    # Aligned ticks start on wall clock multiples of the period, e.g. on
+    # every full second for fps=1.
+
+    def __init__(self, name, fps, max_skip=5, history=256, wake=None,
+                 aligned=False):
+        self.name = name
+        self.wake = wake
+        self.aligned = aligned
+        self.period = 1.0 / fps
+        self.max_skip = max_skip
+        self.tick_start = time.perf_counter()
+        self.deadline = self.tick_start + self.period
+        self.skipped = 0
+        self.skipped_in_row = 0
+        self.frame_times = deque(maxlen=history)
+        self.work_times = deque(maxlen=history)
+        SCHEDULERS[name] = self
+
+    def reset(self):
+        # start a new tick from now without recording the current one, for
+        # loops that were paused by a nested loop (a game, the pause screen)
+        self.tick_start = time.perf_counter()
+        self.deadline = self.tick_start + self.period
+        self.skipped_in_row = 0
+
+    def render(self):
+        # False while the current tick is already over its time budget
+        if (time.perf_counter() > self.deadline
+                and self.skipped_in_row < self.max_skip):
+            self.skipped += 1
+            self.skipped_in_row += 1
+            return False
+        self.skipped_in_row = 0
+        return True
+
+    def wait(self):
+        now = time.perf_counter()
+        self.work_times.append(now - self.tick_start)
+        if profiling.ENABLED:
+            # whole tick of the loop, next to the spans it is made of
+            profiling.record(f"{self.name}.tick", self.tick_start,
+                             now - self.tick_start)
+        if self.aligned:
+            # a millisecond past the boundary, so the loop sees the new
+            # second when it wakes up
+            self.deadline = (now + self.period
+                             - time.time() % self.period + 0.001)
+        if now < self.deadline:
+            if self.wake is None:
+                time.sleep(self.deadline - now)
+            elif self.wake.wait(self.deadline - now):
+                self.wake.clear()
+                self.tick_start = time.perf_counter()
+                return
+            self.deadline += self.period
+        elif now - self.deadline > self.period * self.max_skip:
+            # too far behind (or back from a pause), start over from now
+            self.deadline = now + self.period
+        else:
+            self.deadline += self.period
+        end = time.perf_counter()
+        self.frame_times.append(end - self.tick_start)
+        self.tick_start = end
+
+    def stats(self):
+        if not self.frame_times:
+            return None
+        frames = sorted(self.frame_times)
+        work = sorted(self.work_times)
+        return {'fps': len(frames) / sum(frames),
+                'frame_ms': 1000 * frames[len(frames) // 2],
+                'work_ms': 1000 * work[len(work) // 2],
+                'work_max_ms': 1000 * work[-1],
+                'skipped': self.skipped}
+
+    def report(self):
+        stats = self.stats()
+        if stats is None:
+            return f"{self.name}: no frames"
+        return ("{name}: {fps:.1f} fps, frame {frame_ms:.1f} ms, "
+                "work {work_ms:.1f} ms (max {work_max_ms:.1f} ms), "
+                "{skipped} renders skipped").format(name=self.name, **stats)
+
+
+def report():
+    return '\n'.join(s.report() for s in SCHEDULERS.values())
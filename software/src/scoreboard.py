@@ -0,0 +1,72 @@
+import threading
+
+from . import profiling
+
+# Renders for the MAX7219 dot matrix run on a worker thread, so SPI
+# transfers and scrolling never hold up a game loop. The mailbox only
+# keeps the newest render per key (usually the device it draws on):
+# anything posted while the worker is busy replaces the previous, not yet
+# shown, one.
+
+_cond = threading.Condition()
+_pending = {}
+_busy = False
+_cancel = threading.Event()
+_thread = None
+
+
+def start():
+    global _thread
+    if _thread is not None:
+        return
+    _thread = threading.Thread(target=_run, name='scoreboard', daemon=True)
+    _thread.start()
+
+
+def post(render, *args, key=None):
+    # Show render(*args) on the dot matrix as soon as the worker is free.
+    # Without a worker the render runs right away.
+    if _thread is None:
+        render(*args)
+        return
+    with _cond:
+        _pending.pop(key, None)
+        _pending[key] = (render, args)
+        _cond.notify_all()
+
+
+def cancel():
+    # drop the pending renders and stop a running scroll
+    with _cond:
+        _pending.clear()
+        _cancel.set()
+
+
+def cancelled():
+    # polled by long renders such as scrolling text
+    return _cancel.is_set()
+
+
+def flush(timeout=None):
+    # wait until everything posted has been shown
+    with _cond:
+        return _cond.wait_for(lambda: not _pending and not _busy, timeout)
+
+
+def _run():
+    global _busy
+    while True:
+        with _cond:
+            _busy = False
+            _cond.notify_all()
+            _cond.wait_for(lambda: _pending)
+            # oldest key first
+            key = next(iter(_pending))
+            render, args = _pending.pop(key)
+            _busy = True
+            _cancel.clear()
+        try:
+            with profiling.measure('scoreboard'):
+                render(*args)
+        except Exception as e:
+            print(f"scoreboard: {e}")
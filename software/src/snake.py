@@ -1,11 +1,12 @@
 import random
-import pickle
-import os
 import time
-import pygame
+from array import array
 
 from . import main
-from . import PI, INSTALL_DIR
+from . import scheduler
+from . import inputs
+from . import highscores
+from . import PI
 
 # snake constants #
 UP = 'up'
@@ -13,47 +14,50 @@ DOWN = 'down'
 LEFT = 'left'
 RIGHT = 'right'
 
-HEAD = 0  # syntactic sugar: index of the worm's head
+SPEED = 0.15  # seconds per step
 
 
 # gaming main routines #
-def runSnakeGame():
+def runSnakeGame(display):
 
+    width = display.width
+    height = display.height
     # Set a random start point.
-    startx = random.randint(2, main.BOARDWIDTH - 2)
-    starty = random.randint(2, main.BOARDHEIGHT - 2)
-    wormCoords = [{'x': startx,     'y': starty},
-                  {'x': startx - 1, 'y': starty},
-                  {'x': startx - 2, 'y': starty}]
+    startx = random.randint(2, width - 2)
+    starty = random.randint(2, height - 2)
+    # cells are numbered y * width + x, for the worm and the field
+    worm = getNewWorm(width * height)
+    field = getBlankField(width, height)
+    for x in (startx - 2, startx - 1, startx):
+        pushHead(worm, starty * width + x)
+        occupy(field, starty * width + x)
+    # set when the head moved onto the worm (or no cell is left)
+    crashed = False
+    # cells changed since the last frame, only these are drawn
+    redraw = True
+    changes = {}
     direction = RIGHT
     score = 0
 
-    if os.path.isfile(f'{INSTALL_DIR}/hs_snake.p'):
-        try:
-            highscore = pickle.load(open(f"{INSTALL_DIR}/hs_snake.p", "rb"))
-        except EOFError:
-            highscore = 0
-    else:
-        highscore = 0
+    highscore = highscores.best('snake')
     if PI:
-        # main.scroll_text(f"Snake Highscore: {str(highscore)}")
-        main.matrix_text("SNAKE", (6, 0))
+        # display.scroll_text(f"Snake Highscore: {str(highscore)}")
+        display.matrix_text("SNAKE", (6, 0))
         time.sleep(0.8)
-        main.matrix_image("highscore")
+        display.matrix_image("highscore")
         time.sleep(0.8)
-        main.matrix_text(str(highscore).rjust(3, '0'), (10, 0))
+        display.matrix_text(str(highscore).rjust(3, '0'), (10, 0))
         time.sleep(1)
-        main.matrix_clear()
+        display.matrix_clear()
         time.sleep(1)
 
     # Start the apple in a random place.
-    apple = getRandomLocation(wormCoords)
+    apple = getRandomLocation(field)
 
+    clock = scheduler.Scheduler('snake', 1 / SPEED)
     while True:  # main game loop
         olddirection = direction
-        pygame.event.pump()
-        for event in pygame.event.get():
-            action = main.get_action(event)
+        for action in inputs.poll():
             if (olddirection == direction):   # only one direction change per step
                 if action == 'LEFT':
                     if direction != RIGHT:
@@ -68,124 +72,177 @@ def runSnakeGame():
                     if direction != DOWN:
                         direction = UP
                 if action == 'START':
-                    exit_game = pause_game()
+                    exit_game = pause_game(display)
                     if exit_game:
                         return
+                    clock.reset()
 
-        # check if the worm has hit itself or the edge
-        if (wormCoords[HEAD]['x'] == -1
-                or wormCoords[HEAD]['x'] == main.BOARDWIDTH
-                or wormCoords[HEAD]['y'] == -1
-                or wormCoords[HEAD]['y'] == main.BOARDHEIGHT):
+        if crashed:
             time.sleep(1.5)
-            if score > highscore:
-                highscore = score
-                if PI:
-                    pickle.dump(highscore, open(
-                        f"{INSTALL_DIR}/hs_snake.p", "wb"))
-                    main.scroll_text("New Highscore !!!")
+            if highscores.submit('snake', score) and PI:
+                display.scroll_text("New Highscore !!!")
             return  # game over
-        for wormBody in wormCoords[1:]:
-            if wormBody['x'] == wormCoords[HEAD]['x'] and wormBody['y'] == wormCoords[HEAD]['y']:
-                time.sleep(1.5)
-                if score > highscore:
-                    highscore = score
-                    if PI:
-                        pickle.dump(highscore, open(
-                            f"{INSTALL_DIR}/hs_snake.p", "wb"))
-                        main.scroll_text("New Highscore !!!")
-                return  # game over
 
         # check if worm has eaten an apple
-        if wormCoords[HEAD]['x'] == apple['x'] and wormCoords[HEAD]['y'] == apple['y']:
+        head = wormHead(worm)
+        if head == apple:
             # don't remove worm's tail segment
             score += 1
-            apple = getRandomLocation(wormCoords)  # set a new apple somewhere
+            # set a new apple somewhere
+            apple = getRandomLocation(field)
+            if apple is None:
+                # the worm fills the whole board
+                crashed = True
+                continue
+            # the apple was drawn over the head that ate it
+            changes[head] = 1
+            changes[apple] = 2
         else:
-            del wormCoords[-1]  # remove worm's tail segment
-
-        # move the worm by adding a segment in the direction it is moving
+            # remove worm's tail segment
+            tail = popTail(worm)
+            release(field, tail)
+            changes[tail] = main.BLANK
+
+        # move the worm by adding a segment in the direction it is moving,
+        # leaving the board on one side enters it on the other
+        y, x = divmod(head, width)
         if direction == UP:
-            if wormCoords[HEAD]['y'] == 0:
-                newHead = {'x': wormCoords[HEAD]['x'], 'y': main.BOARDHEIGHT-1}
-            else:
-                newHead = {'x': wormCoords[HEAD]['x'],
-                           'y': wormCoords[HEAD]['y'] - 1}
+            y = (y - 1) % height
         elif direction == DOWN:
-            if wormCoords[HEAD]['y'] == main.BOARDHEIGHT-1:
-                newHead = {'x': wormCoords[HEAD]['x'], 'y': 0}
-            else:
-                newHead = {'x': wormCoords[HEAD]['x'],
-                           'y': wormCoords[HEAD]['y'] + 1}
+            y = (y + 1) % height
         elif direction == LEFT:
-            if wormCoords[HEAD]['x'] == 0:
-                newHead = {'x': main.BOARDWIDTH -
-                           1, 'y': wormCoords[HEAD]['y']}
-            else:
-                newHead = {'x': wormCoords[HEAD]
-                           ['x'] - 1, 'y': wormCoords[HEAD]['y']}
+            x = (x - 1) % width
         elif direction == RIGHT:
-            if wormCoords[HEAD]['x'] == main.BOARDWIDTH-1:
-                newHead = {'x': 0, 'y': wormCoords[HEAD]['y']}
+            x = (x + 1) % width
+        newHead = y * width + x
+        pushHead(worm, newHead)
+        crashed = not occupy(field, newHead)
+        # the apple is drawn over the worm
+        changes[newHead] = 2 if newHead == apple else 1
+        if clock.render():
+            if redraw:
+                display.clearScreen()
+                drawWorm(display, worm, width)
+                drawApple(display, apple, width)
+                redraw = False
             else:
-                newHead = {'x': wormCoords[HEAD]
-                           ['x'] + 1, 'y': wormCoords[HEAD]['y']}
-        if not PI:
-            main.checkForQuit()
-        wormCoords.insert(0, newHead)
-        main.clearScreen()
-        drawWorm(wormCoords)
-        drawApple(apple)
-        main.scoreText(score)
-        main.updateScreen()
-        time.sleep(.15)
+                display.drawChanges(
+                    {divmod(cell, width)[::-1]: (color, 'normal')
+                     for cell, color in changes.items()})
+            changes.clear()
+            display.scoreText(score)
+            display.updateScreen()
+        clock.wait()
 
 
 # snake subroutines #
 
-def getRandomLocation(wormCoords):
-    while True:
-        x = random.randint(0, main.BOARDWIDTH - 1)
-        y = random.randint(0, main.BOARDHEIGHT - 1)
-        if {'x': x, 'y': y} in wormCoords:
-            print('no apples on worm')
-        else:
-            break
-    return {'x': x, 'y': y}
+def getNewWorm(capacity):
+    # The worm's cells in a fixed size ring buffer, the head at 'head' and
+    # the tail 'length' - 1 entries before it. Moving adds a head and drops
+    # the tail in O(1) without allocating. One spare entry takes the head
+    # that runs into a worm filling the whole board.
+    return {'cells': array('H', bytes(2 * (capacity + 1))),
+            'head': 0,
+            'length': 0}
+
+
+def pushHead(worm, cell):
+    cells = worm['cells']
+    worm['head'] = (worm['head'] + 1) % len(cells)
+    cells[worm['head']] = cell
+    worm['length'] += 1
+
+
+def popTail(worm):
+    cells = worm['cells']
+    worm['length'] -= 1
+    return cells[(worm['head'] - worm['length']) % len(cells)]
+
+
+def wormHead(worm):
+    return worm['cells'][worm['head']]
+
+
+def wormCells(worm):
+    # cells from the head to the tail
+    cells = worm['cells']
+    head = worm['head']
+    size = len(cells)
+    for i in range(worm['length']):
+        yield cells[(head - i) % size]
+
+
+def getBlankField(width, height):
+    # Occupancy of the board for O(1) collision checks and apple placement.
+    # Cells are numbered y * width + x. 'free' lists every empty cell in
+    # any order and 'slot' holds the position of each free cell in it, so
+    # cells move in and out of the list by swapping with its last entry.
+    return {'width': width,
+            'height': height,
+            'occupied': bytearray(width * height),
+            'free': list(range(width * height)),
+            'slot': list(range(width * height))}
+
+
+def occupy(field, cell):
+    # mark the cell as taken, False if it already was
+    if field['occupied'][cell]:
+        return False
+    field['occupied'][cell] = 1
+    free = field['free']
+    slot = field['slot']
+    last = free.pop()
+    if last != cell:
+        free[slot[cell]] = last
+        slot[last] = slot[cell]
+    return True
+
+
+def release(field, cell):
+    if not field['occupied'][cell]:
+        return
+    field['occupied'][cell] = 0
+    field['slot'][cell] = len(field['free'])
+    field['free'].append(cell)
+
+
+def getRandomLocation(field):
+    # a random cell not covered by the worm, None when there is none
+    if not field['free']:
+        return None
+    return random.choice(field['free'])
 
 
-def drawWorm(wormCoords):
-    for coord in wormCoords:
-        x = coord['x']
-        y = coord['y']
-        main.drawPixel(x, y, 1)
+def drawWorm(display, worm, width):
+    for cell in wormCells(worm):
+        y, x = divmod(cell, width)
+        display.drawPixel(x, y, 1)
 
 
-def drawApple(coord):
-    x = coord['x']
-    y = coord['y']
-    main.drawPixel(x, y, 2)
+def drawApple(display, cell, width):
+    y, x = divmod(cell, width)
+    display.drawPixel(x, y, 2)
 
 
-def pause_game():
-    main.matrix_text("PAUSE")
+def pause_game(display):
+    display.matrix_text("PAUSE")
     counter = 0
+    clock = scheduler.Scheduler('pause', 10, wake=inputs.ARRIVED)
     while True:
         # Blinking "PAUSE"
         if counter == 15:
-            main.matrix_clear()
+            display.matrix_clear()
         if counter == 30:
-            main.matrix_text("PAUSE")
+            display.matrix_text("PAUSE")
             counter = 0
 
-        pygame.event.pump()
-        for event in pygame.event.get():
-            action = main.get_action(event)
+        for action in inputs.poll():
             # Keep Playing
             if action == 'START':
                 return False
             # End Game
             elif action == 'SELECT':
                 return True
-        time.sleep(0.1)
+        clock.wait()
         counter += 1
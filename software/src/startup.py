@@ -0,0 +1,18 @@
+from time import perf_counter
+
+# Startup timing. main imports this module before anything else, mark()
+# records how many seconds after that a startup step finished. Steps on
+# the loader thread are recorded the same way.
+
+STARTED = perf_counter()
+MARKS = []
+
+
+def mark(name):
+    MARKS.append((name, perf_counter() - STARTED))
+
+
+def report():
+    return "startup: " + ", ".join(
+        f"{name} {seconds:.3f} s"
+        for name, seconds in sorted(MARKS, key=lambda m: m[1]))
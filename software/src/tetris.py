@@ -1,56 +1,86 @@
-import os
 import time
-import pickle
-import pygame
 import random
-from luma.core.render import canvas
 
 from . import main
+from . import scheduler
+from . import inputs
+from . import scoreboard
+from . import profiling
 from .templates_tetris import PIECES
-from . import INSTALL_DIR, PI, RES_DIR
+from . import highscores
+from . import PI
 
 PIECES_ORDER = {'S': 0, 'Z': 1, 'I': 2, 'J': 3, 'L': 4, 'O': 5, 'T': 6}
 SCORES = (0, 40, 100, 300, 1200)
 FALLING_SPEED = 0.7
+# logic ticks per second of the game loop
+FPS = 50
 
 TEMPLATEWIDTH = 5
 TEMPLATEHEIGHT = 5
 
+# Board rows are kept as integer bitmasks: bit x + WALL is set when cell x
+# is occupied. WALL set bits on both sides act as the left and right wall,
+# so a shifted piece row never needs a separate bounds check.
+WALL = TEMPLATEWIDTH
 
-def runTetrisGame():
+
+def compilePiece(template):
+    # Turn one 5x5 template into the data the game routines work with:
+    # the (x, y) offsets of its boxes, a bitmask per occupied row and the
+    # lowest box of every occupied column.
+    cells = [(x, y) for y in range(TEMPLATEHEIGHT)
+             for x in range(TEMPLATEWIDTH) if template[y][x] != '.']
+    rows = {}
+    bottoms = {}
+    for x, y in cells:
+        rows[y] = rows.get(y, 0) | 1 << x
+        bottoms[x] = max(bottoms.get(x, y), y)
+    return {'cells': cells,
+            'rows': sorted(rows.items()),
+            'bottoms': sorted(bottoms.items())}
+
+
+# compiled form of every shape and rotation in PIECES
+PIECE_TABLE = {shape: [compilePiece(t) for t in rotations]
+               for shape, rotations in PIECES.items()}
+
+
+def runTetrisGame(display):
     # setup varia
     # bles for the start of the game
     # if PI:
     # device.contrast(255)
     # device.show()
-    board = getBlankBoard()
+    board = getBlankBoard(display.width, display.height)
+    # Only cells that changed are drawn: the board cells set since the
+    # last frame (dirty) and the cells the pieces covered in the last
+    # frame (shown) or cover now. Clearing lines redraws everything.
+    redraw = True
+    dirty = set()
+    shown = {}
     lastFallTime = time.time()
     score = 0
     oldscore = -1
     oldpiece = 10
     lines = 0
     level, fallFreq = calculateLevelAndFallFreq(lines)
-    if os.path.isfile(f'{INSTALL_DIR}/hs_tetris.p'):
-        try:
-            highscore = pickle.load(open(f"{INSTALL_DIR}/hs_tetris.p", "rb"))
-        except EOFError:
-            highscore = 0
-    else:
-        highscore = 0
+    highscore = highscores.best('tetris')
     if PI:
-        main.matrix_image('tetris')
+        display.matrix_image('tetris')
         time.sleep(0.8)
-        main.matrix_image('highscore')
+        display.matrix_image('highscore')
         time.sleep(0.8)
         # score as 6 digit value
-        main.matrix_text(str(highscore).rjust(6, '0'), (4, 0))
+        display.matrix_text(str(highscore).rjust(6, '0'), (4, 0))
         time.sleep(2)
-        main.matrix_clear()
+        display.matrix_clear()
         time.sleep(0.8)
 
-    fallingPiece = getNewPiece()
-    nextPiece = getNewPiece()
+    fallingPiece = getNewPiece(board)
+    nextPiece = getNewPiece(board)
 
+    clock = scheduler.Scheduler('tetris', FPS)
     while True:  # game loop
 
         # Used to skip processing after a quickdrop and avoid movement
@@ -59,25 +89,16 @@ def runTetrisGame():
         if not fallingPiece:
             # No falling piece in play, so start a new piece at the top
             fallingPiece = nextPiece
-            nextPiece = getNewPiece()
+            nextPiece = getNewPiece(board)
             lastFallTime = time.time()  # reset lastFallTime
 
             if not isValidPosition(board, fallingPiece):
                 time.sleep(2)
-                if score > highscore:
-                    highscore = score
-                    if PI:
-                        pickle.dump(highscore, open(
-                            f"{INSTALL_DIR}/hs_tetris.p", "wb"))
-                        main.scroll_text("New Highscore !!!")
+                if highscores.submit('tetris', score) and PI:
+                    display.scroll_text("New Highscore !!!")
 
                 return  # can't fit a new piece on the board, so game over
-        if not PI:
-            main.checkForQuit()
-
-        pygame.event.pump()
-        for event in pygame.event.get():
-            action = main.get_action(event)
+        for action in inputs.poll():
 
             # D-Pad Movement
             if (action == 'DOWN'
@@ -85,12 +106,9 @@ def runTetrisGame():
                 fallingPiece['y'] += 1
             # Quick Drop Down
             elif action == 'UP':
-                i = 0
-                for i in range(1, main.BOARDHEIGHT):
-                    if not isValidPosition(board, fallingPiece, adjY=i):
-                        break
-                score += i
-                fallingPiece['y'] += i - 1
+                i = dropDistance(board, fallingPiece)
+                score += i + 1
+                fallingPiece['y'] += i
                 # stop event loop to not move after a quick drop
                 quickdrop = True
             elif (action == 'LEFT'
@@ -116,12 +134,13 @@ def runTetrisGame():
                         fallingPiece['rotation'] - 1) % len(PIECES[fallingPiece['shape']])
             # Pause screen (with option to exit)
             if action == 'START':
-                exit_game = pause_game()
+                exit_game = pause_game(display)
                 if exit_game:
                     return
                 else:
+                    clock.reset()
                     # Redraw scoreboard and continue game
-                    scoreTetris(score, level, PIECES_ORDER.get(
+                    scoreTetris(display, score, level, PIECES_ORDER.get(
                         nextPiece['shape']))
 
         # let the piece fall if it is time to fall
@@ -131,7 +150,10 @@ def runTetrisGame():
             if not isValidPosition(board, fallingPiece, adjY=1):
                 # falling piece has landed, set it on the board
                 addToBoard(board, fallingPiece)
+                dirty.update(pieceCells(fallingPiece))
                 remLine = removeCompleteLines(board)
+                if remLine:
+                    redraw = True
                 # count lines for level calculation
                 lines += remLine
                 # more lines, more points per line
@@ -146,31 +168,47 @@ def runTetrisGame():
         # Ghost Piece to help aiming
         if fallingPiece is not None:
             ghost_piece = fallingPiece.copy()
-            i = 0
-            for i in range(1, main.BOARDHEIGHT):
-                if not isValidPosition(board, ghost_piece, adjY=i):
-                    break
-            ghost_piece['y'] += i - 1
-
-        # drawing everything on the screen
-        main.clearScreen()
-        drawBoard(board)
+            ghost_piece['y'] += dropDistance(board, fallingPiece)
+
+        # drawing everything on the screen, skipped while catching up
+        if not clock.render():
+            clock.wait()
+            continue
+        overlay = {}
+        if fallingPiece is not None:
+            for cell in pieceCells(ghost_piece):
+                overlay[cell] = (ghost_piece['color'], 'ghost')
+            for cell in pieceCells(fallingPiece):
+                overlay[cell] = (fallingPiece['color'], 'normal')
+        if redraw:
+            display.clearScreen()
+            drawBoard(display, board)
+            display.drawChanges(overlay)
+            redraw = False
+        else:
+            changes = {}
+            for x, y in dirty | shown.keys() | overlay.keys():
+                if (x, y) in overlay:
+                    changes[x, y] = overlay[x, y]
+                elif 0 <= y < board['height']:
+                    changes[x, y] = (board['cells'][y][x], 'normal')
+            display.drawChanges(changes)
+        dirty.clear()
+        shown = overlay
         # scoreText(score)
         if score > oldscore:
-            scoreTetris(score, level, PIECES_ORDER.get(nextPiece['shape']))
+            scoreTetris(display, score, level,
+                        PIECES_ORDER.get(nextPiece['shape']))
             oldscore = score
         if oldpiece != PIECES_ORDER.get(nextPiece['shape']):
-            scoreTetris(score, level, PIECES_ORDER.get(nextPiece['shape']))
+            scoreTetris(display, score, level,
+                        PIECES_ORDER.get(nextPiece['shape']))
             oldpiece = PIECES_ORDER.get(nextPiece['shape'])
         # drawStatus(score, level)
         # drawNextPiece(nextPiece)
-        if fallingPiece is not None:
-            drawPiece(ghost_piece, True)
-            drawPiece(fallingPiece)
 
-        main.updateScreen()
-        # FPSCLOCK.tick(FPS)
-        time.sleep(.02)
+        display.updateScreen()
+        clock.wait()
 
 # tetris subroutines #
 
@@ -188,12 +226,12 @@ def calculateLevelAndFallFreq(lines):
     return level, fallFreq
 
 
-def getNewPiece():
+def getNewPiece(board):
     # return a random new piece in a random rotation and color
     shape = random.choice(list(PIECES.keys()))
     newPiece = {'shape': shape,
                 'rotation': random.randint(0, len(PIECES[shape]) - 1),
-                'x': int(main.BOARDWIDTH / 2) - int(TEMPLATEWIDTH / 2),
+                'x': int(board['width'] / 2) - int(TEMPLATEWIDTH / 2),
                 'y': -2,  # start it above the board (i.e. less than 0)
                 'color': PIECES_ORDER.get(shape)}
     return newPiece
@@ -201,137 +239,164 @@ def getNewPiece():
 
 def addToBoard(board, piece):
     # fill in the board based on piece's location, shape, and rotation
-    for x in range(TEMPLATEWIDTH):
-        for y in range(TEMPLATEHEIGHT):
-            if PIECES[piece['shape']][piece['rotation']][y][x] != main.BLANK:
-                board[x + piece['x']][y + piece['y']] = piece['color']
+    for x, y in PIECE_TABLE[piece['shape']][piece['rotation']]['cells']:
+        boardX = x + piece['x']
+        boardY = y + piece['y']
+        if boardY < 0:
+            continue
+        board['cells'][boardY][boardX] = piece['color']
+        board['rows'][boardY] |= 1 << (boardX + WALL)
+        board['cols'][boardX] |= 1 << boardY
 
 
-def isOnBoard(x, y):
-    return x >= 0 and x < main.BOARDWIDTH and y < main.BOARDHEIGHT
+def pieceCells(piece):
+    # board coordinates of the boxes of the piece
+    cells = PIECE_TABLE[piece['shape']][piece['rotation']]['cells']
+    return [(piece['x'] + x, piece['y'] + y) for x, y in cells]
 
 
+@profiling.span('isValidPosition')
 def isValidPosition(board, piece, adjX=0, adjY=0):
     # Return True if the piece is within the board and not colliding
-    for x in range(TEMPLATEWIDTH):
-        for y in range(TEMPLATEHEIGHT):
-            isAboveBoard = y + piece['y'] + adjY < 0
-            if isAboveBoard or PIECES[piece['shape']][piece['rotation']][y][x] == main.BLANK:
-                continue
-            if not isOnBoard(x + piece['x'] + adjX, y + piece['y'] + adjY):
-                return False
-            if board[x + piece['x'] + adjX][y + piece['y'] + adjY] != main.BLANK:
-                return False
+    rows = board['rows']
+    shift = piece['x'] + adjX + WALL
+    top = piece['y'] + adjY
+    for dy, mask in PIECE_TABLE[piece['shape']][piece['rotation']]['rows']:
+        y = top + dy
+        if y < 0:
+            continue  # above the board
+        if y >= board['height'] or rows[y] & (mask << shift):
+            return False
     return True
 
 
-def isCompleteLine(board, y):
-    # Return True if the line filled with boxes with no gaps.
-    for x in range(main.BOARDWIDTH):
-        if board[x][y] == main.BLANK:
-            return False
-    return True
+@profiling.span('dropDistance')
+def dropDistance(board, piece):
+    # Return how many rows the piece can fall. For the lowest box of each
+    # column the next occupied cell below is the lowest set bit of the
+    # column mask shifted down to the row under the box.
+    cols = board['cols']
+    distance = board['height']
+    for dx, dy in PIECE_TABLE[piece['shape']][piece['rotation']]['bottoms']:
+        x = piece['x'] + dx
+        below = piece['y'] + dy + 1
+        if not 0 <= x < board['width']:
+            # column outside the walls, still above the board
+            distance = min(distance, -below)
+            continue
+        if below >= 0:
+            blocked = cols[x] >> below
+        else:
+            blocked = cols[x] << -below
+        if blocked:
+            free = (blocked & -blocked).bit_length() - 1
+        else:
+            free = board['height'] - below
+        distance = min(distance, free)
+    return distance
 
 
+@profiling.span('removeCompleteLines')
 def removeCompleteLines(board):
     # Remove any completed lines on the board, move everything above them down,
-    # and return the number of complete lines.
-    numLinesRemoved = 0
-    y = main.BOARDHEIGHT - 1  # start y at the bottom of the board
-    while y >= 0:
-        if isCompleteLine(board, y):
-            # Remove the line and pull boxes down by one line.
-            for pullDownY in range(y, 0, -1):
-                for x in range(main.BOARDWIDTH):
-                    board[x][pullDownY] = board[x][pullDownY-1]
-            # Set very top line to blank.
-            for x in range(main.BOARDWIDTH):
-                board[x][0] = main.BLANK
-            numLinesRemoved += 1
-            # Note on the next iteration of the loop, y is the same.
-            # This is so that if the line that was pulled down is also
-            # complete, it will be removed.
-        else:
-            y -= 1  # move on to check next row up
+    # and return the number of complete lines. The remaining rows are
+    # compacted to the bottom in a single pass.
+    rows = board['rows']
+    height = board['height']
+    keep = [y for y in range(height) if rows[y] != board['full']]
+    numLinesRemoved = height - len(keep)
+    if not numLinesRemoved:
+        return 0
+    cleared = [y for y in range(height) if rows[y] == board['full']]
+    cells = board['cells']
+    cells[:] = ([[main.BLANK] * board['width']
+                 for _ in range(numLinesRemoved)]
+                + [cells[y] for y in keep])
+    rows[:] = [board['empty']] * numLinesRemoved + [rows[y] for y in keep]
+    # top to bottom, removing a line moves the bits above it down by one
+    # and leaves the positions of the lines further down unchanged
+    cols = board['cols']
+    for x in range(board['width']):
+        col = cols[x]
+        for y in cleared:
+            above = (1 << y) - 1
+            col = (col & above) << 1 | col >> (y + 1) << (y + 1)
+        cols[x] = col
     return numLinesRemoved
 
 
-def drawBoard(matrix):
-    for i in range(0, main.BOARDWIDTH):
-        for j in range(0, main.BOARDHEIGHT):
-            main.drawPixel(i, j, matrix[i][j])
-
+@profiling.span('drawBoard')
+def drawBoard(display, board):
+    display.drawCells(board['cells'])
 
-def getBlankBoard():
-    # create and return a new blank board data structure
-    board = []
-    for i in range(main.BOARDWIDTH):
-        board.append([main.BLANK] * main.BOARDHEIGHT)
-    return board
 
+def getBlankBoard(width, height):
+    # create and return a new blank board data structure, cells are
+    # stored row by row as board['cells'][y][x]
+    cells = []
+    for i in range(height):
+        cells.append([main.BLANK] * width)
+    wall = (1 << WALL) - 1
+    empty = wall | wall << (WALL + width)
+    full = (1 << (2 * WALL + width)) - 1
+    return {'width': width,
+            'height': height,
+            'cells': cells,
+            'rows': [empty] * height,
+            'cols': [0] * width,
+            'empty': empty,
+            'full': full}
 
-def drawPiece(piece, ghost=False, pixelx=None, pixely=None):
-    shapeToDraw = PIECES[piece['shape']][piece['rotation']]
-    if pixelx is None and pixely is None:
-        # if pixelx & pixely hasn't been specified, use the location stored
-        # in the piece data structure
-        pixelx = piece['x']
-        pixely = piece['y']
 
-    # draw each of the boxes that make up the piece
-    for x in range(TEMPLATEWIDTH):
-        for y in range(TEMPLATEHEIGHT):
-            if shapeToDraw[y][x] != main.BLANK:
-                if ghost:
-                    main.drawDarkPixel(pixelx + x, pixely + y, piece['color'])
-                else:
-                    main.drawPixel(pixelx + x, pixely + y, piece['color'])
-
-
-def scoreTetris(score, level, nextpiece):
+def scoreTetris(display, score, level, nextpiece):
     # if PI:
     # device.clear()
     _score = score
     if _score > 999999:
         _score = 999999
 
-    if PI:
-        # one point per level
-        with canvas(main.DEVICE) as draw1:
-            for i in range(0, level):
-                main.drawScorePixel((i*2)+1, 7, 1, draw1)
+    if display.device is not None:
+        # drawn by the scoreboard worker, only the newest state is shown
+        scoreboard.post(renderScoreTetris, display.device, _score, level,
+                        nextpiece, key=display.device)
 
-            # score as 6 digit value
-            for i in range(0, 6):
-                main.drawnumberMAX7219(_score % 10, (i*4)+1, 0, draw1)
-                _score //= 10
 
-            # draw next piece
-            main.drawTetrisMAX7219(nextpiece, 27, 0, draw1)
+def renderScoreTetris(device, score, level, nextpiece):
+    from luma.core.render import canvas
+    # one point per level
+    with canvas(device) as draw1:
+        for i in range(0, level):
+            main.drawScorePixel((i*2)+1, 7, 1, draw1)
+
+        # score as 6 digit value
+        for i in range(0, 6):
+            main.drawnumberMAX7219(score % 10, (i*4)+1, 0, draw1)
+            score //= 10
+
+        # draw next piece
+        main.drawTetrisMAX7219(nextpiece, 27, 0, draw1)
 
-            if PI:
-                main.DEVICE.show()
+        device.show()
 
 
-def pause_game():
-    main.matrix_text("PAUSE")
+def pause_game(display):
+    display.matrix_text("PAUSE")
     counter = 0
+    clock = scheduler.Scheduler('pause', 10, wake=inputs.ARRIVED)
     while True:
         # Blinking "PAUSE"
         if counter == 15:
-            main.matrix_clear()
+            display.matrix_clear()
         if counter == 30:
-            main.matrix_text("PAUSE")
+            display.matrix_text("PAUSE")
             counter = 0
 
-        pygame.event.pump()
-        for event in pygame.event.get():
-            action = main.get_action(event)
+        for action in inputs.poll():
             # Keep Playing
             if action == 'START':
                 return False
             # End Game
             elif action == 'SELECT':
                 return True
-        time.sleep(0.1)
+        clock.wait()
         counter += 1